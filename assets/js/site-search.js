@@ -0,0 +1,120 @@
+/*
+	Client-side search over the static index written by
+	`python scripts/search_index.py export search`.
+
+	siteSearch('border "national security"', 10).then(function(results) { ... });
+
+	Each result is {score, title, url, kind}. Only the term shards a query
+	needs are fetched, and each is fetched once per page load.
+*/
+
+(function(window) {
+
+	var base = 'search/',
+		meta = null,
+		docs = null,
+		shards = {},
+		tokenRe = /[\p{L}\p{M}\p{N}_]+/gu,
+		phraseRe = /"([^"]+)"/g;
+
+	function getJSON(path) {
+		return fetch(base + path).then(function(response) {
+			if (!response.ok)
+				throw new Error('Search index: ' + path + ' returned ' + response.status);
+			return response.json();
+		});
+	}
+
+	function tokenize(text) {
+		return text.toLowerCase().match(tokenRe) || [];
+	}
+
+	// 32-bit FNV-1a over UTF-8 bytes, same as fnv1a() in search_index.py
+	function fnv1a(term) {
+		var bytes = new TextEncoder().encode(term),
+			hash = 0x811c9dc5;
+		for (var i = 0; i < bytes.length; i++) {
+			hash ^= bytes[i];
+			hash = Math.imul(hash, 0x01000193) >>> 0;
+		}
+		return hash;
+	}
+
+	function load() {
+		if (!meta)
+			meta = Promise.all([getJSON('meta.json'), getJSON('docs.json')]).then(function(parts) {
+				docs = parts[1];
+				return parts[0];
+			});
+		return meta;
+	}
+
+	function shardFor(term, count) {
+		var number = fnv1a(term) % count;
+		if (!shards[number])
+			shards[number] = getJSON('terms-' + number + '.json');
+		return shards[number];
+	}
+
+	function hasPhrase(phrase, doc, positions) {
+		var starts = positions[phrase[0]] && positions[phrase[0]][doc];
+		if (!starts)
+			return false;
+		return starts.some(function(start) {
+			return phrase.every(function(term, offset) {
+				var list = positions[term] && positions[term][doc];
+				return list && list.indexOf(start + offset) !== -1;
+			});
+		});
+	}
+
+	window.siteSearch = function(query, limit) {
+		limit = limit || 10;
+		var phrases = [],
+			match;
+		while ((match = phraseRe.exec(query)) !== null) {
+			var phrase = tokenize(match[1]);
+			if (phrase.length)
+				phrases.push(phrase);
+		}
+		var terms = tokenize(query.replace(phraseRe, ' '));
+		phrases.forEach(function(phrase) { terms = terms.concat(phrase); });
+		terms = terms.filter(function(term, i) { return terms.indexOf(term) === i; });
+		if (!terms.length)
+			return Promise.resolve([]);
+
+		return load().then(function(info) {
+			return Promise.all(terms.map(function(term) { return shardFor(term, info.shards); }))
+				.then(function(loaded) {
+					var scores = {},
+						positions = {};
+					terms.forEach(function(term, i) {
+						var postings = loaded[i][term];
+						if (!postings)
+							return;
+						var df = postings.length,
+							idf = Math.log(1 + (info.docs - df + 0.5) / (df + 0.5));
+						positions[term] = {};
+						postings.forEach(function(posting) {
+							// posting is [doc, position, position, ...]
+							var doc = posting[0],
+								tf = posting.length - 1,
+								norm = info.k1 * (1 - info.b + info.b * docs[doc][3] / info.avgdl);
+							scores[doc] = (scores[doc] || 0) + idf * tf * (info.k1 + 1) / (tf + norm);
+							positions[term][doc] = posting.slice(1);
+						});
+					});
+					return Object.keys(scores)
+						.filter(function(doc) {
+							return phrases.every(function(phrase) { return hasPhrase(phrase, doc, positions); });
+						})
+						.map(function(doc) {
+							return {score: scores[doc], title: docs[doc][0], url: docs[doc][1], kind: docs[doc][2]};
+						})
+						.sort(function(a, b) { return b.score - a.score; })
+						.slice(0, limit);
+				});
+		});
+	};
+
+})(window);
@@ -0,0 +1,118 @@
+"""Check the single-pass sanitizer against the old four-pass BeautifulSoup one and time both.
+
+Run from the repository root:
+
+    python benchmarks/bench_sanitizer.py
+
+Fixtures are built from warroom-articles.json by putting back the kind of
+markup the JNews theme wraps around article bodies (scripts, ads, share
+buttons, embeds, styled paragraphs), so no recorded pages need to be stored.
+"""
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from bs4 import BeautifulSoup
+from html_sanitizer import LXML_AVAILABLE, sanitize_html
+
+CORPUS_FILE = 'warroom-articles.json'
+
+NOISE = [
+    '<script type="text/javascript">var jnews = {"ajax":"<div>x</div>"};</script>',
+    '<style>.jeg_post{color:red}</style>',
+    '<div class="jeg_ad jeg_ad_article jnews_content_inline_ads"><div class="ads-wrapper align-right"></div></div>',
+    '<iframe src="https://rumble.com/embed/v6abc/" width="640" height="360" frameborder="0" allowfullscreen><p>fallback</p></iframe>',
+    '<!-- wp:paragraph -->',
+    '<p>&nbsp;</p>',
+    '<div class="jeg_share_button clearfix"><a href="#" class="jeg_btn-facebook"><i class="fa fa-facebook-official"></i><span>Share</span></a></div>',
+    '<figure class="wp-block-image size-large"><img decoding="async" width="1024" height="576" src="https://warroom.org/wp-content/uploads/x.jpg" alt="" srcset="a 1024w, b 300w"><figcaption class="wp-element-caption">Photo &amp; caption</figcaption></figure>',
+    '<br>',
+    '<hr/>',
+    '<table><tr><td>cell &lt;1&gt;</td></tr></table>',
+]
+
+
+def reference_clean_html(html_content):
+    """The original clean_html_content from scrape_warroom.py"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for element in soup(['script', 'style', 'iframe']):
+        element.decompose()
+    for tag in soup.find_all(True):
+        tag.attrs = {key: value for key, value in tag.attrs.items()
+                     if key in ['href', 'src', 'alt']}
+    allowed_tags = ['p', 'a', 'b', 'strong', 'i', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                    'ul', 'ol', 'li', 'blockquote', 'img', 'article', 'section', 'figure',
+                    'figcaption', 'div', 'span']
+    for tag in soup.find_all(True):
+        if tag.name not in allowed_tags:
+            tag.unwrap()
+    for tag in soup.find_all():
+        if len(tag.get_text(strip=True)) == 0 and not tag.find_all(['img']):
+            tag.decompose()
+    cleaned_html = str(soup)
+    cleaned_html = re.sub(r'\n\s*\n', '\n', cleaned_html)
+    cleaned_html = re.sub(r'>\s+<', '>\n<', cleaned_html)
+    return cleaned_html
+
+
+def build_fixtures(seed=7):
+    rng = random.Random(seed)
+    with open(CORPUS_FILE, 'r', encoding='utf-8') as f:
+        articles = json.load(f)
+    fixtures = []
+    for article in articles:
+        if not article.get('content'):
+            continue
+        parts = []
+        for paragraph in re.split(r'(?<=</p>)', article['content']):
+            parts.append(paragraph.replace('<p>', '<p class="has-text-align-left" style="margin:0">', 1))
+            if rng.random() < 0.5:
+                parts.append(rng.choice(NOISE))
+        fixtures.append(
+            '<div class="jeg_post_content"><div class="content-inner "><div class="jeg_inner_content">'
+            + ''.join(parts)
+            + '<div class="jeg_post_tags"><span>Tags:</span> <a href="/tag/x" rel="tag">X &amp; Y</a></div>'
+            + '<script>jQuery(function(){})</script></div></div></div>'
+        )
+    return fixtures
+
+
+def timed(fn, inputs, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in inputs:
+            fn(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    fixtures = build_fixtures()
+    large = [''.join(fixtures[i:i + 40]) for i in range(0, 200, 40)]  # ~250 KB articles
+    deep = ['<div>' * 500 + '<p>deep text</p>' + '</div>' * 500]
+
+    parsers = ['html.parser'] + (['lxml'] if LXML_AVAILABLE else [])
+    print(f'{len(fixtures)} fixtures, parsers: {", ".join(parsers)}')
+
+    for parser in parsers:
+        mismatches = [i for i, html in enumerate(fixtures + deep)
+                      if reference_clean_html(html) != sanitize_html(html, parser=parser)]
+        print(f'{parser}: {len(mismatches)} outputs differ from the reference')
+
+    for label, inputs in (('corpus', fixtures), ('large articles', large), ('deep tree', deep)):
+        baseline = timed(reference_clean_html, inputs)
+        print(f'\n{label}: reference {baseline * 1000:.1f} ms')
+        for parser in parsers:
+            elapsed = timed(lambda html: sanitize_html(html, parser=parser), inputs)
+            print(f'  {parser}: {elapsed * 1000:.1f} ms ({baseline / elapsed:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
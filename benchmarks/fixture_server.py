@@ -0,0 +1,363 @@
+"""Local stand-in for warroom.org and the War Room Rumble channel.
+
+Serves pages shaped like the real ones, with the markup the scrapers'
+selectors target, built from warroom-articles.json and natalie-videos.json
+so no recorded pages need to be stored. Pages captured from the live sites
+can be dropped into a directory passed as record_dir (path/index.html or
+path.html) and are served verbatim instead.
+
+    /category/newsroom/[page/N/]        JNews listing, LISTING_PAGE_SIZE previews per page,
+                                        404 with .jeg_404_content past the end
+    /<article slug>/                    article page with the theme's noise around the body
+    /c/BannonsWarRoom/videos[?page=N]   Rumble channel, RUMBLE_PAGE_SIZE videos per page,
+                                        the last page again past the end (as Rumble does)
+    /wp-json/wp/v2/posts                WordPress REST API over the same articles: per_page,
+                                        page, orderby, order, modified_after, _fields and
+                                        _embed, X-WP-Total(Pages) headers, 400 past the end
+
+Every response is delayed by latency_ms +/- jitter_ms, and a share of
+error_rate requests answers error_status with Retry-After: 0 instead.
+
+Run on its own to point a browser or a script at it:
+
+    python benchmarks/fixture_server.py --port 8765 --latency-ms 50 --error-rate 0.02
+"""
+import argparse
+import html
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench_sanitizer import NOISE
+
+CORPUS_FILE = 'warroom-articles.json'
+VIDEOS_FILE = 'natalie-videos.json'
+LISTING_PATH = '/category/newsroom/'
+RUMBLE_PATH = '/c/BannonsWarRoom/videos'
+API_PATH = '/wp-json/wp/v2/posts'
+API_DEFAULT_PER_PAGE = 10
+API_MAX_PER_PAGE = 100
+LISTING_PAGE_SIZE = 10
+RUMBLE_PAGE_SIZE = 25
+PAGINATOR_WINDOW = 3  # Page links shown either side of the current one
+
+PAGE_SHELL = (
+    '<!DOCTYPE html><html lang="en-US"><head><meta charset="UTF-8"><title>{title}</title>'
+    '<link rel="stylesheet" href="/wp-content/themes/jnews/style.css">'
+    '<script src="https://www.googletagmanager.com/gtag/js?id=G-X"></script></head>'
+    '<body class="jnews"><div class="jeg_viewport"><div class="jeg_header"><nav>{nav}</nav></div>'
+    '<div class="jeg_main">{body}</div><div class="jeg_footer">&copy; WarRoom</div></div>'
+    '<script src="/wp-content/themes/jnews/main.js"></script></body></html>'
+)
+
+
+def _slug(file_name):
+    return file_name[:-len('.html')] if file_name.endswith('.html') else file_name
+
+
+def _json_error(status, code, message):
+    body = json.dumps({'code': code, 'message': message, 'data': {'status': status}})
+    return status, body, {'Content-Type': 'application/json; charset=UTF-8'}
+
+
+def _listing_date(published):
+    try:
+        return datetime.strptime(published, '%Y-%m-%d').strftime('%B %d, %Y')
+    except (TypeError, ValueError):
+        return 'January 1, 2024'
+
+
+class Fixtures:
+    """Pre-rendered pages, keyed by path"""
+
+    def __init__(self, corpus_file=CORPUS_FILE, videos_file=VIDEOS_FILE, listing_pages=None,
+                 videos=None, seed=7):
+        rng = random.Random(seed)
+        with open(corpus_file, 'r', encoding='utf-8') as f:
+            articles = [a for a in json.load(f) if a.get('fileName') and a.get('content')]
+        if listing_pages:
+            articles = articles[:listing_pages * LISTING_PAGE_SIZE]
+        self.articles = {f'/{_slug(a["fileName"])}/': a for a in articles}
+        self.article_pages = {path: self._article_page(a, rng) for path, a in self.articles.items()}
+        self.listing = [list(self.articles.items())[i:i + LISTING_PAGE_SIZE]
+                        for i in range(0, len(articles), LISTING_PAGE_SIZE)]
+        self.posts = [self._post(n + 1, path, a, rng) for n, (path, a) in enumerate(self.articles.items())]
+
+        with open(videos_file, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+        count = videos or len(recorded)
+        self.videos = []
+        for n in range(count):
+            video = recorded[n % len(recorded)]
+            link = urlsplit(video['link']).path
+            if n >= len(recorded):
+                link = link.replace('.html', f'-{n}.html')
+            self.videos.append({'title': video['title'], 'link': link, 'thumbnail': video['thumbnail']})
+        self.rumble_pages = max(1, -(-len(self.videos) // RUMBLE_PAGE_SIZE))
+
+    def _article_page(self, article, rng):
+        parts = []
+        for paragraph in re.split(r'(?<=</p>)', article['content']):
+            parts.append(paragraph)
+            if rng.random() < 0.5:
+                parts.append(rng.choice(NOISE))
+        body = (
+            '<div class="jeg_content"><div class="jeg_inner_content">'
+            f'<h1 class="jeg_post_title">{html.escape(article["title"])}</h1>'
+            '<div class="jeg_post_content"><div class="content-inner ">'
+            + ''.join(parts)
+            + '</div></div><div class="jeg_share_button"><a href="#">Share</a></div></div></div>'
+        )
+        return PAGE_SHELL.format(title=html.escape(article['title']), nav='', body=body)
+
+    def _post(self, post_id, path, article, rng):
+        try:
+            day = datetime.strptime(article.get('publishedDate') or '', '%Y-%m-%d')
+        except ValueError:
+            day = datetime(2024, 1, 1)
+        date = day + timedelta(hours=rng.randrange(6, 22), minutes=rng.randrange(60))
+        modified = date + timedelta(hours=rng.randrange(0, 72))
+        return {
+            'id': post_id,
+            'date': date.isoformat(),
+            'modified': modified.isoformat(),
+            'path': path,
+            'title': {'rendered': html.escape(article['title'])},
+            'excerpt': {'rendered': f'<p>{html.escape(article.get("excerpt") or "")}</p>\n', 'protected': False},
+            'content': {'rendered': article['content'], 'protected': False},
+            '_links': {'author': [{'embeddable': True}], 'wp:term': [{'embeddable': True}]},
+            '_embedded': {
+                'author': [{'id': 1, 'name': article.get('author') or 'Warroom Staff'}],
+                'wp:term': [
+                    [{'taxonomy': 'category', 'name': html.escape(c)} for c in article.get('categories') or []],
+                    []
+                ]
+            }
+        }
+
+    def api_posts(self, query, origin):
+        def param(name, default=''):
+            return query.get(name, [default])[0]
+
+        try:
+            per_page = int(param('per_page', API_DEFAULT_PER_PAGE))
+            page_num = int(param('page', 1))
+        except ValueError:
+            return _json_error(400, 'rest_invalid_param', 'Invalid parameter(s): page, per_page')
+        if not 1 <= per_page <= API_MAX_PER_PAGE or page_num < 1:
+            return _json_error(400, 'rest_invalid_param', 'Invalid parameter(s): page, per_page')
+        posts = self.posts
+        if param('modified_after'):
+            posts = [p for p in posts if p['modified'] > param('modified_after')]
+        key = 'modified' if param('orderby') == 'modified' else 'date'
+        posts = sorted(posts, key=lambda p: (p[key], p['id']), reverse=param('order', 'desc') != 'asc')
+
+        total_pages = -(-len(posts) // per_page)
+        if page_num > max(total_pages, 1):
+            return _json_error(400, 'rest_post_invalid_page_number',
+                               'The page number requested is larger than the number of pages available.')
+        fields = set(param('_fields').split(',')) if param('_fields') else None
+        items = []
+        for post in posts[(page_num - 1) * per_page:page_num * per_page]:
+            item = {key: value for key, value in post.items() if key != 'path'}
+            item['link'] = origin + post['path']
+            if fields:
+                item = {key: value for key, value in item.items() if key in fields or key == '_embedded'}
+            if '_embed' not in query:
+                item.pop('_embedded', None)
+            items.append(item)
+        headers = {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'X-WP-Total': str(len(posts)),
+            'X-WP-TotalPages': str(total_pages)
+        }
+        return 200, json.dumps(items), headers
+
+    def listing_page(self, page_num, origin):
+        if not 1 <= page_num <= len(self.listing):
+            body = '<div class="jeg_404_content"><h2>Page Not Found</h2></div>'
+            return 404, PAGE_SHELL.format(title='Page not found', nav='', body=body)
+        items = []
+        for path, article in self.listing[page_num - 1]:
+            items.append(
+                '<article class="jeg_post jeg_pl_md_2 format-standard">'
+                '<div class="jeg_thumb"><a href="{url}"><img src="/wp-content/uploads/thumb.jpg" alt=""></a></div>'
+                '<div class="jeg_postblock_content">'
+                '<h3 class="jeg_post_title"><a href="{url}">{title}</a></h3>'
+                '<div class="jeg_post_meta"><div class="jeg_meta_author"><span class="by">by</span> '
+                '<a href="/author/x/">{author}</a></div>'
+                '<div class="jeg_meta_date"><a href="{url}"><i class="fa fa-clock-o"></i> {date}</a></div></div>'
+                '<div class="jeg_post_excerpt"><p>{excerpt}</p></div></div></article>'.format(
+                    url=origin + path,
+                    title=html.escape(article['title']),
+                    author=html.escape(article.get('author') or 'Warroom Staff'),
+                    date=_listing_date(article.get('publishedDate')),
+                    excerpt=html.escape(article.get('excerpt') or ''))
+            )
+        body = f'<div class="jeg_posts jeg_load_more_flag">{"".join(items)}</div>'
+        return 200, PAGE_SHELL.format(title='Newsroom', nav='', body=body)
+
+    def rumble_page(self, page_num):
+        # Rumble serves the last page for any number past the end
+        page_num = min(max(page_num, 1), self.rumble_pages)
+        start = (page_num - 1) * RUMBLE_PAGE_SIZE
+        items = []
+        for video in self.videos[start:start + RUMBLE_PAGE_SIZE]:
+            items.append(
+                '<li class="videostream thumbnail__grid--item"><div class="thumbnail__thumb">'
+                '<a class="videostream__link link" draggable="false" href="{link}">'
+                '<img class="thumbnail__image" draggable="false" src="{thumb}" alt="{title}"></a>'
+                '<div class="videostream__time">12:34</div></div>'
+                '<div class="videostream__footer"><h3 class="thumbnail__title">{title}</h3></div></li>'.format(
+                    link=html.escape(video['link']), thumb=html.escape(video['thumbnail']),
+                    title=html.escape(video['title']))
+            )
+        pages = range(max(1, page_num - PAGINATOR_WINDOW), min(self.rumble_pages, page_num + PAGINATOR_WINDOW) + 1)
+        paginator = ''.join(
+            f'<span class="paginator--link{" paginator--link--current" if n == page_num else ""}" aria-label="{n}">{n}</span>'
+            for n in pages
+        )
+        body = (f'<ol class="thumbnail__grid">{"".join(items)}</ol>'
+                f'<div class="paginator"><nav>{paginator}</nav></div>')
+        return 200, PAGE_SHELL.format(title='Bannons War Room', nav='', body=body)
+
+    def route(self, path, query, origin):
+        if path == LISTING_PATH:
+            return self.listing_page(1, origin)
+        match = re.fullmatch(re.escape(LISTING_PATH) + r'page/(\d+)/', path)
+        if match:
+            return self.listing_page(int(match.group(1)), origin)
+        if path == RUMBLE_PATH:
+            return self.rumble_page(int(query.get('page', ['1'])[0] or 1))
+        if path.rstrip('/') == API_PATH:
+            return self.api_posts(query, origin)
+        if path in self.article_pages:
+            return 200, self.article_pages[path]
+        return 404, PAGE_SHELL.format(title='Not found', nav='', body='<div class="jeg_404_content"></div>')
+
+
+class FixtureServer:
+    """Threaded HTTP server for Fixtures with latency and error injection, run in the background"""
+
+    def __init__(self, fixtures, host='127.0.0.1', port=0, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, error_status=503, record_dir=None, seed=7):
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.record_dir = record_dir
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _recorded(self, path):
+        if not self.record_dir:
+            return None
+        relative = path.strip('/') or 'index'
+        for candidate in (os.path.join(self.record_dir, relative, 'index.html'),
+                          os.path.join(self.record_dir, relative + '.html')):
+            if os.path.isfile(candidate):
+                with open(candidate, 'rb') as f:
+                    return f.read()
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    delay = max(0.0, server.latency_ms + server.rng.uniform(-1, 1) * server.jitter_ms) / 1000
+                    fail = server.rng.random() < server.error_rate
+                    if fail:
+                        server.errors += 1
+                time.sleep(delay)
+                if fail:
+                    self._send(server.error_status, b'<html><body>Service Unavailable</body></html>',
+                               {'Retry-After': '0'})
+                    return
+                parts = urlsplit(self.path)
+                body = server._recorded(parts.path)
+                if body is not None:
+                    self._send(200, body)
+                    return
+                status, page, *headers = server.fixtures.route(parts.path, parse_qs(parts.query),
+                                                               f'http://{self.headers.get("Host")}')
+                self._send(status, page.encode('utf-8'), headers[0] if headers else None)
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                headers = {'Content-Type': 'text/html; charset=UTF-8', **(headers or {})}
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'injected_errors': self.errors}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Serve warroom.org and Rumble fixture pages locally')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--listing-pages', type=int, default=None, help='limit the newsroom listing to N pages')
+    parser.add_argument('--videos', type=int, default=None, help='number of videos on the Rumble channel')
+    parser.add_argument('--record-dir', default=None, help='directory of captured pages to serve verbatim')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    fixtures = Fixtures(listing_pages=args.listing_pages, videos=args.videos)
+    server = FixtureServer(fixtures, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           error_rate=args.error_rate, record_dir=args.record_dir).start()
+    print(f'Serving {len(fixtures.articles)} articles in {len(fixtures.listing)} listing pages and '
+          f'{len(fixtures.videos)} videos in {fixtures.rumble_pages} channel pages at {server.base_url}')
+    print(f'  listing: {server.base_url}{LISTING_PATH}')
+    print(f'  rumble:  {server.base_url}{RUMBLE_PATH}')
+    print(f'  api:     {server.base_url}{API_PATH}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+        sys.exit(0)
@@ -0,0 +1,341 @@
+"""Run the scrapers and the build steps against the local fixture server and record the results.
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --cases scrape_warroom --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+
+Each case runs in its own subprocess and scratch directory, so peak RSS
+(sampled over the whole process tree, Chromium included) and the metrics
+registry belong to that case alone. For every case the results report
+throughput, p50/p99 latency of the case's main stage (taken from the
+scripts' own metrics), peak RSS and the fixture server's request counts.
+
+Runs are appended to benchmarks/results.jsonl with the current commit,
+and each one is compared with the last earlier run that used the same
+settings.
+
+The browser cases need Chromium (`playwright install chromium`); without
+it they are reported as failed and the other cases still run.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'scripts'))
+
+from fixture_server import API_PATH, CORPUS_FILE, LISTING_PATH, RUMBLE_PATH, VIDEOS_FILE, Fixtures, FixtureServer
+
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results.jsonl')
+RSS_SAMPLE_INTERVAL = 0.05  # seconds
+
+# Case -> (stage whose latency is reported, what one item is)
+CASES = {
+    'sanitize': ('sanitize', 'article'),
+    'generate_pages': ('page_render', 'page'),
+    'scrape_warroom': ('http_fetch', 'article'),
+    'scrape_warroom_api': ('api_fetch', 'article'),
+    'fresh_warroom_scraper': ('navigate', 'video'),
+    'warroom_video_updater': ('navigate', 'video'),
+}
+
+
+class RssSampler:
+    """Peak and mean RSS of this process plus all of its children, sampled in a thread"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self.total = 0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        try:
+            import psutil
+        except ImportError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self._sample()
+            self.peak = max(self.peak, rss)
+            self.total += rss
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # Short peaks between samples still show up in the kernel's high-water mark
+        self.peak = max(self.peak, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+# Cases (run inside the worker subprocess, in a scratch directory) --------------
+
+def run_sanitize(base_url, args):
+    import bench_sanitizer
+    from scrape_warroom import clean_html_content
+    bench_sanitizer.CORPUS_FILE = os.path.join(ROOT_DIR, CORPUS_FILE)
+    fixtures = bench_sanitizer.build_fixtures()
+    for _ in range(args.repeat):
+        for html in fixtures:
+            clean_html_content(html)
+    return len(fixtures) * args.repeat
+
+
+def run_generate_pages(base_url, args):
+    import generate_article_pages
+    from article_corpus import SITE_ARTICLES_FILE
+    # Render the corpus the site serves, from where the other build steps read it
+    shutil.copy(os.path.join(ROOT_DIR, CORPUS_FILE), SITE_ARTICLES_FILE)
+    generate_article_pages.ARTICLES_FILE = SITE_ARTICLES_FILE
+    for _ in range(args.repeat):
+        generate_article_pages.main(workers=1, force=True)
+    with open(SITE_ARTICLES_FILE, 'r', encoding='utf-8') as f:
+        return len(json.load(f)) * args.repeat
+
+
+def _unthrottled(module, args):
+    # The per-host token bucket exists to be polite to the real sites; against
+    # the fixture server it would only measure itself
+    if args.unthrottled:
+        from rate_control import RateController
+        module.RateController = functools.partial(RateController, host_rate=1e6, host_burst=1e6)
+
+
+def run_scrape_warroom(base_url, args):
+    import scrape_warroom
+    scrape_warroom.LISTING_URL = base_url + LISTING_PATH
+    _unthrottled(scrape_warroom, args)
+    articles, _ = asyncio.run(scrape_warroom.scrape_articles(source='listing'))
+    return len(articles)
+
+
+def run_scrape_warroom_api(base_url, args):
+    import scrape_warroom
+    scrape_warroom.POSTS_API_URL = base_url + API_PATH
+    scrape_warroom.LISTING_URL = base_url + LISTING_PATH
+    _unthrottled(scrape_warroom, args)
+    articles, _ = asyncio.run(scrape_warroom.scrape_articles(source='api'))
+    return len(articles)
+
+
+def run_fresh_warroom_scraper(base_url, args):
+    import fresh_warroom_scraper
+    fresh_warroom_scraper.URL = base_url + RUMBLE_PATH
+    if args.parallel:
+        _unthrottled(fresh_warroom_scraper, args)
+        asyncio.run(fresh_warroom_scraper.scrape_rumble_parallel(args.parallel))
+    else:
+        fresh_warroom_scraper.scrape_rumble()
+    with open(fresh_warroom_scraper.OUTPUT_FILE, 'r', encoding='utf-8') as f:
+        return len(json.load(f)['videos'])
+
+
+def run_warroom_video_updater(base_url, args):
+    import warroom_video_updater
+    warroom_video_updater.URL = base_url + RUMBLE_PATH
+    warroom_video_updater.scrape_rumble()
+    from video_store import VideoStore
+    return len(VideoStore().load(legacy_file=None).links)
+
+
+def _merged_stage(registry, stage):
+    """Merge the latency samples of every series of `stage` (e.g. one per host)"""
+    samples, count = [], 0
+    for (name, key), histogram in registry.histograms.items():
+        if name == 'stage_seconds' and ('stage', stage) in key:
+            samples.extend(histogram.samples)
+            count += histogram.count
+    samples.sort()
+
+    def pct(q):
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2) if samples else None
+
+    return count, pct(0.5), pct(0.99)
+
+
+def worker(case, base_url, args):
+    """Run one case here and print its result as JSON on the last line"""
+    import metrics
+    workdir = tempfile.mkdtemp(prefix=f'bench-{case}-')
+    os.chdir(workdir)
+    error = None
+    items = 0
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        try:
+            items = globals()[f'run_{case}'](base_url, args)
+        except Exception as e:
+            error = f'{type(e).__name__}: {str(e).strip().splitlines()[0] if str(e).strip() else ""}'
+        elapsed = time.perf_counter() - start
+    os.chdir(ROOT_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    stage, unit = CASES[case]
+    calls, p50, p99 = _merged_stage(metrics.REGISTRY, stage)
+    stages = {}
+    for (name, key), histogram in metrics.REGISTRY.histograms.items():
+        if name == 'stage_seconds':
+            label = dict(key).get('stage')
+            stages[label] = stages.get(label, 0) + round(histogram.sum, 3)
+    result = {
+        'status': 'error' if error else 'ok',
+        'error': error,
+        'items': items,
+        'unit': unit,
+        'seconds': round(elapsed, 3),
+        'throughput': round(items / elapsed, 2) if elapsed and items else 0,
+        'stage': stage,
+        'stage_calls': calls,
+        'p50_ms': p50,
+        'p99_ms': p99,
+        'peak_rss_mb': round(rss.peak / 2**20, 1),
+        'mean_rss_mb': round(rss.total / rss.samples / 2**20, 1) if rss.samples else None,
+        'stage_seconds': stages,
+    }
+    print(json.dumps(result))
+
+
+# Driver ---------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(settings, path=RESULTS_FILE):
+    last = None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    run = json.loads(line)
+                    if run['settings'] == settings:
+                        last = run
+    except FileNotFoundError:
+        pass
+    return last
+
+
+def change(new, old):
+    if not new or not old:
+        return ''
+    return f' ({(new - old) / old:+.0%})'
+
+
+def report(results, baseline):
+    print(f'\n{"case":<24}{"items":>7}{"items/s":>10}{"p50 ms":>9}{"p99 ms":>9}{"peak MB":>9}')
+    for case, result in results.items():
+        old = (baseline or {}).get('cases', {}).get(case, {})
+        if result['status'] != 'ok':
+            print(f'{case:<24}  failed: {result["error"]}')
+            continue
+        print(f'{case:<24}{result["items"]:>7}{result["throughput"]:>10}{result["p50_ms"] or "-":>9}'
+              f'{result["p99_ms"] or "-":>9}{result["peak_rss_mb"]:>9}')
+        if old.get('status') == 'ok':
+            print(f'{"":<24}vs {baseline["commit"]}: throughput{change(result["throughput"], old["throughput"])}'
+                  f', p99{change(result["p99_ms"], old["p99_ms"])}'
+                  f', peak RSS{change(result["peak_rss_mb"], old["peak_rss_mb"])}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the scripts against a local fixture server')
+    parser.add_argument('--cases', default=','.join(CASES), help='comma-separated cases to run')
+    parser.add_argument('--latency-ms', type=float, default=20, help='server latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=10, help='+/- random latency per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--listing-pages', type=int, default=5, help='newsroom listing pages to serve')
+    parser.add_argument('--videos', type=int, default=200, help='videos on the fixture Rumble channel')
+    parser.add_argument('--parallel', type=int, default=0, help='run fresh_warroom_scraper with --parallel N')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the corpus for the offline cases')
+    parser.add_argument('--unthrottled', action='store_true', help='lift the per-host request rate limit')
+    parser.add_argument('--label', default='', help='note stored with the results')
+    parser.add_argument('--results', default=RESULTS_FILE, help='JSONL file the run is appended to')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        worker(args.worker, args.base_url, args)
+        return
+
+    cases = [case for case in args.cases.split(',') if case]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        sys.exit(f'Unknown cases: {", ".join(sorted(unknown))} (choose from {", ".join(CASES)})')
+    settings = {key: getattr(args, key) for key in
+                ('latency_ms', 'jitter_ms', 'error_rate', 'listing_pages', 'videos', 'parallel', 'repeat', 'unthrottled')}
+    fixtures = Fixtures(os.path.join(ROOT_DIR, CORPUS_FILE), os.path.join(ROOT_DIR, VIDEOS_FILE),
+                        listing_pages=args.listing_pages, videos=args.videos)
+
+    results = {}
+    for case in cases:
+        # A fresh server per case so request counts and the error sequence are comparable
+        server = FixtureServer(fixtures, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               error_rate=args.error_rate).start()
+        print(f'Running {case} against {server.base_url}...')
+        command = [sys.executable, os.path.abspath(__file__), '--worker', case, '--base-url', server.base_url]
+        for key, value in settings.items():
+            if value is True:
+                command.append(f'--{key.replace("_", "-")}')
+            elif value not in (None, False):
+                command += [f'--{key.replace("_", "-")}', str(value)]
+        completed = subprocess.run(command, cwd=ROOT_DIR, capture_output=True, text=True)
+        server.stop()
+        try:
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+        except (IndexError, json.JSONDecodeError):
+            result = {'status': 'error', 'error': (completed.stderr.strip().splitlines() or ['no output'])[-1]}
+        result['server'] = server.get_stats()
+        results[case] = result
+
+    baseline = previous_run(settings, args.results)
+    run = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'label': args.label,
+        'python': sys.version.split()[0],
+        'settings': settings,
+        'cases': results,
+    }
+    with open(args.results, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run) + '\n')
+    report(results, baseline)
+    print(f'\nResults appended to {os.path.relpath(args.results)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import json
+import os
+
+CHECKPOINT_FILE = 'public/warroom-articles.checkpoint.jsonl'
+
+
+class ArticleCheckpoint:
+    """Append-only JSONL log of articles finished by the current crawl.
+
+    Each article is written as one line the moment it completes, so the
+    write volume grows linearly with the crawl. The log is replayed after a
+    crash and cleared once it has been compacted into the main JSON file.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self.file = None
+
+    def read(self):
+        """Return the articles in the log, ignoring a line cut short by a crash"""
+        articles = []
+        if not os.path.exists(self.path):
+            return articles
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    articles.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f'Skipping truncated checkpoint line in {self.path}')
+        return articles
+
+    def append(self, article):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            needs_newline = self._ends_mid_line()
+            self.file = open(self.path, 'a', encoding='utf-8')
+            if needs_newline:
+                # Don't glue the first new record onto a line cut short by a crash
+                self.file.write('\n')
+        self.file.write(json.dumps(article, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def _ends_mid_line(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def clear(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
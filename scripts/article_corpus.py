@@ -0,0 +1,152 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+# The article corpus the site serves /warroom-articles/ from
+SITE_ARTICLES_FILE = 'warroom-articles.json'
+CHUNK_SIZE = 1 << 16
+WHITESPACE = ' \t\n\r'
+
+
+@contextmanager
+def atomic_open(path, mode='w'):
+    """Open a temp file next to `path` for writing and rename it into place on success"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files; these are published
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    with atomic_open(path) as f:
+        json.dump(data, f, **dump_kwargs)
+
+
+def _skip_whitespace(buf, pos):
+    while pos < len(buf) and buf[pos] in WHITESPACE:
+        pos += 1
+    return pos
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array one at a time.
+
+    Only the element being decoded (plus one read chunk) is held in memory,
+    however large the file is.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        eof = not buf
+        pos = _skip_whitespace(buf, 0)
+        if pos >= len(buf) or buf[pos] != '[':
+            raise ValueError(f'{path} does not contain a JSON array')
+        pos += 1
+
+        while True:
+            pos = _skip_whitespace(buf, pos)
+            if pos < len(buf) and buf[pos] == ',':
+                pos = _skip_whitespace(buf, pos + 1)
+            if pos < len(buf) and buf[pos] == ']':
+                return
+
+            obj = end = None
+            if pos < len(buf):
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    end = None
+                # Only trust an element once its separator has been read; a number
+                # cut by the chunk boundary would otherwise decode short
+                if end is not None:
+                    after = _skip_whitespace(buf, end)
+                    if after >= len(buf) or buf[after] not in ',]':
+                        end = None
+
+            if end is None:
+                if eof:
+                    raise ValueError(f'{path} has a malformed element or ends in the middle of a JSON array')
+                # Grow geometrically so one huge element doesn't cost quadratic re-parsing
+                more = f.read(max(chunk_size, len(buf) - pos))
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            yield obj
+            pos = end
+            if pos >= chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+
+def iter_articles(path):
+    """Stream articles from a JSON array, a JSONL file or a legacy {"articles": [...]} file"""
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(CHUNK_SIZE).lstrip(WHITESPACE)[:1]
+    if first == '{':
+        # Old wrapper format is small enough to load whole
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f).get('articles', [])
+        return
+    yield from iter_json_array(path)
+
+
+class JsonArrayWriter:
+    """Write a JSON array one element at a time, atomically.
+
+    The output is byte-for-byte what `json.dump(items, f, indent=indent)` would
+    produce, or `json.dump({key: items}, ...)` when `key` is given.
+    """
+
+    def __init__(self, path, key=None, indent=2, ensure_ascii=False):
+        self.path = path
+        self.key = key
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.count = 0
+        self._context = None
+        self._file = None
+        depth = 2 if key else 1
+        self._item_prefix = '\n' + ' ' * (indent * depth)
+        self._closing = '\n' + ' ' * (indent * (depth - 1)) + ']'
+
+    def __enter__(self):
+        self._context = atomic_open(self.path)
+        self._file = self._context.__enter__()
+        if self.key:
+            self._file.write('{\n' + ' ' * self.indent + json.dumps(self.key) + ': [')
+        else:
+            self._file.write('[')
+        return self
+
+    def write(self, item):
+        text = json.dumps(item, indent=self.indent, ensure_ascii=self.ensure_ascii)
+        text = text.replace('\n', self._item_prefix)
+        self._file.write((',' if self.count else '') + self._item_prefix + text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._file.write(self._closing if self.count else ']')
+            if self.key:
+                self._file.write('\n}')
+        return self._context.__exit__(exc_type, exc, tb)
@@ -0,0 +1,163 @@
+import asyncio
+import httpx
+from bs4 import BeautifulSoup
+from browser_pool import USER_AGENT
+from playwright.async_api import Error as PlaywrightError
+from rate_control import check_response
+from scrape_profile import load_page_async
+
+import metrics
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx when installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import lxml  # noqa: F401
+    SOUP_PARSER = 'lxml'
+except ImportError:
+    SOUP_PARSER = 'html.parser'
+
+HTTP_TIMEOUT = 30  # seconds
+HTTP_MAX_CONNECTIONS = 20
+NAVIGATION_TIMEOUT = 90000
+
+# Tried in order; the first one that matches provides the article body
+CONTENT_SELECTORS = [
+    'article.jeg_post.jeg_pl_lg_2',
+    '.entry-content',
+    '.content-inner',
+    '.jeg_post_content',
+    'article'  # Added fallback
+]
+
+
+def extract_content(html, selectors=CONTENT_SELECTORS):
+    """Return (inner_html, selector) for the first selector that matches, or (None, None)"""
+    soup = BeautifulSoup(html, SOUP_PARSER)
+    for selector in selectors:
+        elem = soup.select_one(selector)
+        if elem:
+            return elem.decode_contents(), selector
+    return None, None
+
+
+class HttpFetcher:
+    """Fetches article HTML over a pooled keep-alive HTTP client and parses it locally.
+
+    Works for any page whose content is rendered server-side, which is the
+    case for warroom.org articles. gzip/deflate are always negotiated, brotli
+    when the `brotli` package is installed and HTTP/2 when `h2` is.
+    With a RateController, requests are paced and transient failures retried.
+    """
+
+    name = 'http'
+
+    def __init__(self, max_connections=HTTP_MAX_CONNECTIONS, timeout=HTTP_TIMEOUT, controller=None, **client_kwargs):
+        self.controller = controller
+        accept_encoding = 'gzip, deflate'
+        try:
+            import brotli  # noqa: F401
+            accept_encoding += ', br'
+        except ImportError:
+            pass
+
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            headers={
+                'User-Agent': USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml',
+                'Accept-Encoding': accept_encoding
+            },
+            **client_kwargs
+        )
+
+    async def fetch_content(self, url):
+        if self.controller:
+            return await self.controller.call(url, self._fetch, url)
+        return await self._fetch(url)
+
+    async def _fetch(self, url):
+        with metrics.stage('http_fetch', metrics.host_of(url)):
+            response = await self.client.get(url)
+            response.raise_for_status()
+        metrics.inc('http_bytes_total', len(response.content), host=metrics.host_of(url))
+        # Parsing is CPU bound, keep it off the event loop
+        with metrics.stage('extract'):
+            return await asyncio.to_thread(extract_content, response.text)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class BrowserFetcher:
+    """Renders the article in a pooled Playwright tab (slow path for client-side pages)"""
+
+    name = 'browser'
+
+    def __init__(self, pool, navigation_timeout=NAVIGATION_TIMEOUT, controller=None):
+        self.pool = pool
+        self.navigation_timeout = navigation_timeout
+        self.controller = controller
+
+    async def fetch_content(self, url):
+        if self.controller:
+            return await self.controller.call(url, self._fetch, url)
+        return await self._fetch(url)
+
+    async def _fetch(self, url):
+        with metrics.stage('browser_fetch', metrics.host_of(url)):
+            return await self._render(url)
+
+    async def _render(self, url):
+        async with self.pool.page() as page:
+            print(f'Loading article page: {url}')
+            # Done as soon as any content container exists, not when the network goes quiet
+            response = await load_page_async(page, url, ', '.join(CONTENT_SELECTORS), timeout=self.navigation_timeout)
+            check_response(url, response)
+
+            for selector in CONTENT_SELECTORS:
+                try:
+                    content_elem = await page.query_selector(selector)
+                    if content_elem:
+                        return await content_elem.inner_html(), selector
+                except PlaywrightError:
+                    continue
+            return None, None
+
+    async def close(self):
+        pass
+
+
+class FallbackFetcher:
+    """Tries each fetcher in order until one of them finds article content"""
+
+    def __init__(self, *fetchers):
+        self.fetchers = fetchers
+        self.hits = {fetcher.name: 0 for fetcher in fetchers}
+
+    async def fetch_content(self, url):
+        for fetcher in self.fetchers:
+            try:
+                content, selector = await fetcher.fetch_content(url)
+            except Exception as e:
+                print(f'{fetcher.name} fetch failed for {url}: {str(e)}')
+                continue
+            if content:
+                self.hits[fetcher.name] += 1
+                metrics.inc('fetch_hits_total', fetcher=fetcher.name)
+                print(f'Found content using selector: {selector} ({fetcher.name})')
+                return content, selector
+        return None, None
+
+    async def close(self):
+        for fetcher in self.fetchers:
+            await fetcher.close()
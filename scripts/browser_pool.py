@@ -0,0 +1,179 @@
+import asyncio
+from contextlib import asynccontextmanager
+from scrape_profile import CONTEXT_OPTIONS, TrafficStats, apply_profile_async
+
+BROWSER_ARGS = ['--disable-gpu', '--disable-dev-shm-usage', '--no-sandbox']
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+PAGE_MAX_USES = 25  # Recycle a tab (and its context) after this many navigations
+
+
+class PooledPage:
+    """A browser tab plus the context it lives in, and how often it has been used"""
+
+    def __init__(self, context, page, generation, traffic):
+        self.context = context
+        self.page = page
+        self.generation = generation
+        self.traffic = traffic
+        self.uses = 0
+
+
+class BrowserPool:
+    """Long-lived Chromium instance that hands out reusable tabs to workers.
+
+    One browser is launched for the whole crawl. Each slot owns its own
+    context so cookies and caches never leak between tabs, and a slot is
+    thrown away and rebuilt after `max_uses` navigations to keep memory flat.
+    If the browser process dies it is relaunched on the next checkout.
+    Every context uses the shared scraping profile, so images, fonts and
+    trackers are never downloaded.
+    """
+
+    def __init__(self, playwright, size, max_uses=PAGE_MAX_USES, page_timeout=None):
+        self.playwright = playwright
+        self.size = size
+        self.max_uses = max_uses
+        self.page_timeout = page_timeout
+        self.browser = None
+        self.generation = 0
+        self.restarts = 0
+        self.pages_recycled = 0
+        self.drains = 0
+        self.traffic = TrafficStats()
+        self._idle = asyncio.Queue()
+        self._launch_lock = asyncio.Lock()
+
+    async def start(self, launch=True):
+        """Open the pool; with launch=False Chromium only starts when a tab is first needed"""
+        if launch:
+            await self._launch()
+        # Slots are filled lazily; None means "create a tab on first use"
+        for _ in range(self.size):
+            self._idle.put_nowait(None)
+        print(f'Browser pool started with {self.size} tabs')
+        return self
+
+    async def close(self):
+        while not self._idle.empty():
+            slot = self._idle.get_nowait()
+            if slot:
+                await self._discard(slot)
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _launch(self):
+        self.browser = await self.playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+        self.generation += 1
+
+    async def ensure_browser(self):
+        """Launch Chromium unless it is already running"""
+        async with self._launch_lock:
+            if self.browser and self.browser.is_connected():
+                return
+            if self.browser:
+                print('Browser disconnected, relaunching...')
+                self.restarts += 1
+            await self._launch()
+
+    async def _new_slot(self):
+        await self.ensure_browser()
+        context = await self.browser.new_context(
+            **CONTEXT_OPTIONS,
+            bypass_csp=True,
+            user_agent=USER_AGENT
+        )
+        traffic = TrafficStats(parent=self.traffic)
+        await apply_profile_async(context, traffic)
+        page = await context.new_page()
+        if self.page_timeout:
+            page.set_default_timeout(self.page_timeout)
+        return PooledPage(context, page, self.generation, traffic)
+
+    async def _discard(self, slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            # The context is already gone if the browser crashed
+            pass
+
+    async def drain(self, relaunch=False):
+        """Close every tab's context, and relaunch the browser too if `relaunch`.
+
+        Waits for tabs in use to be returned; checkouts made meanwhile queue
+        up behind the drain and get freshly built tabs once it is done.
+        """
+        slots = []
+        try:
+            while len(slots) < self.size:
+                slots.append(await self._idle.get())
+            for i, slot in enumerate(slots):
+                if slot:
+                    await self._discard(slot)
+                    slots[i] = None
+            if relaunch and self.browser:
+                async with self._launch_lock:
+                    try:
+                        await self.browser.close()
+                    except Exception:
+                        pass
+                    self.restarts += 1
+                    await self._launch()
+            self.drains += 1
+        finally:
+            for slot in slots:
+                self._idle.put_nowait(slot)
+
+    def _is_stale(self, slot):
+        return (
+            slot.generation != self.generation
+            or slot.page.is_closed()
+            or not self.browser.is_connected()
+        )
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a tab for the duration of the `async with` block"""
+        slot = await self._idle.get()
+        try:
+            if slot is not None and self._is_stale(slot):
+                await self._discard(slot)
+                slot = None
+            if slot is None:
+                slot = await self._new_slot()
+        except Exception:
+            self._idle.put_nowait(None)
+            raise
+
+        failed = False
+        try:
+            yield slot.page
+        except Exception:
+            failed = True
+            raise
+        finally:
+            slot.uses += 1
+            slot.traffic.end_page(slot.page.url)
+            if failed or slot.uses >= self.max_uses or self._is_stale(slot):
+                self.pages_recycled += 1
+                await self._discard(slot)
+                slot = None
+            self._idle.put_nowait(slot)
+
+    def get_stats(self):
+        return {
+            'tabs': self.size,
+            'recycled': self.pages_recycled,
+            'restarts': self.restarts,
+            'drains': self.drains,
+            **self.traffic.get_stats()
+        }
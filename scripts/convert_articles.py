@@ -1,6 +1,10 @@
+import argparse
 import json
 import os
 from datetime import datetime
+from article_corpus import JsonArrayWriter, iter_articles
+import metrics
+import profiling
 
 def ensure_directories():
     """Create the directory structure for all content types"""
@@ -13,35 +17,22 @@ def ensure_directories():
 
 def convert_articles():
     """Convert existing articles to new format under news directory"""
-    # Read existing articles
-    with open('warroom-articles.json', 'r', encoding='utf-8') as f:
-        existing_data = json.load(f)
-    
-    # Convert to new format
-    us_articles = {
-        "articles": []
-    }
-    
-    # Handle case where existing_data is a list
-    articles_list = existing_data if isinstance(existing_data, list) else existing_data.get('articles', [])
-    
-    for article in articles_list:
-        new_article = {
-            "id": article.get('slug', ''),
-            "title": article.get('title', ''),
-            "slug": article.get('slug', ''),
-            "publishedDate": article.get('date', datetime.now().strftime('%Y-%m-%d')),
-            "excerpt": article.get('excerpt', ''),
-            "content": article.get('content', ''),
-            "region": "us",
-            "category": article.get('category', 'news'),
-            "tags": article.get('tags', ['news'])
-        }
-        us_articles['articles'].append(new_article)
-    
-    # Write US news articles
-    with open('public/us/news/articles.json', 'w', encoding='utf-8') as f:
-        json.dump(us_articles, f, indent=2, ensure_ascii=False)
+    # Stream existing articles (list or {"articles": [...]}) straight into the new file
+    with metrics.stage('convert'), JsonArrayWriter('public/us/news/articles.json', key='articles') as writer:
+        for article in iter_articles('warroom-articles.json'):
+            new_article = {
+                "id": article.get('slug', ''),
+                "title": article.get('title', ''),
+                "slug": article.get('slug', ''),
+                "publishedDate": article.get('date', datetime.now().strftime('%Y-%m-%d')),
+                "excerpt": article.get('excerpt', ''),
+                "content": article.get('content', ''),
+                "region": "us",
+                "category": article.get('category', 'news'),
+                "tags": article.get('tags', ['news'])
+            }
+            writer.write(new_article)
+    metrics.inc('articles_total', writer.count)
 
 def create_placeholder_data():
     """Create placeholder data for products and businesses"""
@@ -97,10 +88,21 @@ def create_placeholder_data():
         with open(f'public/{region}/businesses/businesses.json', 'w', encoding='utf-8') as f:
             json.dump(businesses, f, indent=2, ensure_ascii=False)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Convert the article corpus to the regional content layout')
+    profiling.add_argument(parser)
+    return parser.parse_args()
+
 def main():
     ensure_directories()
     convert_articles()
     create_placeholder_data()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    try:
+        main()
+    finally:
+        metrics.write_run_summary('convert_articles') 
\ No newline at end of file
@@ -0,0 +1,131 @@
+import hashlib
+import sqlite3
+from datetime import datetime
+
+CRAWL_STATE_FILE = 'warroom-crawl-state.sqlite3'
+
+
+def content_hash(content):
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+class CrawlState:
+    """Persistent record of what the article crawl has already seen and where it stopped.
+
+    Writes are only committed by `checkpoint()`. The scraper records an
+    article only after appending it to the checkpoint log, so the database
+    never claims an article that didn't make it to disk.
+    """
+
+    def __init__(self, path=CRAWL_STATE_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS articles (
+                source_url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                file_name TEXT,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        ''')
+        self.db.commit()
+        # Loaded once so lookups during the crawl never touch the disk
+        self.seen = {row[0] for row in self.db.execute('SELECT source_url FROM articles')}
+        self.queued = set()
+        self.cursors = {}  # API batch -> cursor to resume from once it is completed
+
+    def get(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def bootstrap(self, articles):
+        """Seed an empty store from an iterable of existing articles"""
+        if self.seen:
+            return
+        for article in articles:
+            self.record_article(article)
+        self.checkpoint()
+        print(f'Crawl state seeded with {len(self.seen)} known articles')
+
+    def is_unchanged(self, article):
+        """True if `article` is already stored with the same content"""
+        if article['sourceUrl'] not in self.seen:
+            return False
+        row = self.db.execute('SELECT content_hash FROM articles WHERE source_url = ?',
+                              (article['sourceUrl'],)).fetchone()
+        return bool(row) and row[0] == content_hash(article.get('content'))
+
+    def is_seen(self, url):
+        return url in self.seen or url in self.queued
+
+    def mark_queued(self, url):
+        self.queued.add(url)
+
+    def record_article(self, article):
+        now = datetime.now().isoformat()
+        url = article['sourceUrl']
+        self.db.execute('''
+            INSERT INTO articles (source_url, content_hash, file_name, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(source_url) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                file_name = excluded.file_name,
+                last_seen = excluded.last_seen
+        ''', (url, content_hash(article.get('content')), article.get('fileName'), now, now))
+        self.seen.add(url)
+
+    def start_run(self, source='listing'):
+        """Return (start_page, frontier) and mark a run as in progress.
+
+        After a crash the crawl resumes after the last listing page whose
+        articles were all saved; `frontier` is the furthest page the crashed
+        run had reached, before which a page of known URLs is expected.
+        Pages of the listing and of the REST API (`source`) don't line up, so
+        a run only resumes one that paged through the same source.
+        """
+        if self.get('status') == 'running' and self.get('source', 'listing') == source:
+            start_page = int(self.get('last_page', 0)) + 1
+            frontier = int(self.get('max_page', 0))
+            print(f'Resuming interrupted crawl at page {start_page} (previously reached page {frontier})')
+        else:
+            start_page, frontier = 1, 0
+            self.set('last_page', 0)
+            self.set('max_page', 0)
+        self.set('status', 'running')
+        self.set('source', source)
+        self.set('started', datetime.now().isoformat())
+        self.checkpoint()
+        return start_page, frontier
+
+    def page_reached(self, page_num):
+        if page_num > int(self.get('max_page', 0)):
+            self.set('max_page', page_num)
+
+    def page_cursor(self, page_num, cursor):
+        self.cursors[page_num] = cursor
+
+    def page_completed(self, page_num):
+        self.set('last_page', page_num)
+        if page_num in self.cursors:
+            self.set('api_cursor', self.cursors[page_num])
+            for done in [n for n in self.cursors if n <= page_num]:
+                del self.cursors[done]
+
+    def finish_run(self):
+        self.set('status', 'complete')
+        self.set('finished', datetime.now().isoformat())
+        self.checkpoint()
+
+    def checkpoint(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
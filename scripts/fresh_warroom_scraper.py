@@ -1,11 +1,24 @@
 from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+import argparse
+import asyncio
 import json
 from datetime import datetime
+from browser_pool import BrowserPool
+from memory_watchdog import MEMORY_BUDGET_MB, MemoryWatchdog
+import memory_watchdog
+from listing_extract import (RUMBLE_PAGINATOR, RUMBLE_VIDEOS, extract_items, extract_items_async,
+                             rumble_pages, rumble_video)
+from scrape_profile import CONTEXT_OPTIONS, TrafficStats, apply_profile, load_page, load_page_async
+from rate_control import AdaptiveLimiter, RateController, call_with_retries, check_response
+import metrics
+import profiling
 
 # URL of the Rumble War Room channel
 URL = "https://rumble.com/c/BannonsWarRoom/videos"
 OUTPUT_FILE = "fresh_warroom_videos.json"  # New output file
 VIDEOS_PER_SAVE = 20  # Save to JSON every 20 videos
+PARALLEL_PAGES = 8  # Default number of pages loaded at once in --parallel mode
 
 def save_to_json(videos):
     """Save the current videos to JSON file"""
@@ -14,7 +27,7 @@ def save_to_json(videos):
         'videos': videos
     }
     
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    with metrics.stage('checkpoint_save'), open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(output_data, f, indent=4, ensure_ascii=False)
     print(f"\nSaved {len(videos)} videos to {OUTPUT_FILE}")
 
@@ -28,86 +41,67 @@ def scrape_rumble():
         # Launch browser with specific options
         browser = p.chromium.launch(headless=True)
         context = browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
+            **CONTEXT_OPTIONS,
             user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         )
+        traffic = TrafficStats()
+        apply_profile(context, traffic)
         page = context.new_page()
 
         try:
             while True:  # Keep going until we can't find more pages
-                # Go to URL with timeout and wait until network is idle
+                # Go to URL, backing off and retrying on timeouts, 429s and 5xx
                 print(f"\nNavigating to page {current_page}...")
                 if current_page == 1:
-                    page.goto(URL, timeout=30000, wait_until='networkidle')
+                    call_with_retries(lambda: check_response(URL, load_page(page, URL, timeout=30000)))
                 
                 # Wait for the video grid to load
                 print("Waiting for video grid...")
                 page.wait_for_selector("ol.thumbnail__grid", timeout=30000)
+                traffic.end_page(f"page {current_page}")
                 
-                # Get all video elements on current page
-                video_elements = page.query_selector_all("ol.thumbnail__grid div.thumbnail__thumb")
-                print(f"Found {len(video_elements)} videos on page {current_page}")
+                # Pull every video on the page in a single evaluate() call
+                with metrics.stage('extract'):
+                    rows = extract_items(page, RUMBLE_VIDEOS)
+                metrics.inc('listing_pages_total')
+                print(f"Found {len(rows)} videos on page {current_page}")
+
+                # Page numbers and the current page from the paginator in one evaluate() call
+                page_numbers, current_number = rumble_pages(extract_items(page, RUMBLE_PAGINATOR))
 
                 # Get total pages if we haven't yet
                 if not total_pages_found:
-                    # Try to find the last page number
-                    page_spans = page.query_selector_all("span.paginator--link")
-                    if page_spans:
-                        page_numbers = [span.get_attribute("aria-label") for span in page_spans]
-                        page_numbers = [int(num) for num in page_numbers if num and num.isdigit()]
-                        if page_numbers:
-                            max_page = max(page_numbers)
-                            print(f"\nDetected approximately {max_page} total pages")
+                    if page_numbers:
+                        max_page = max(page_numbers)
+                        print(f"\nDetected approximately {max_page} total pages")
                     total_pages_found = True
 
                 # Extract video details
-                for i, video in enumerate(video_elements, 1):
-                    try:
-                        # Get video title and thumbnail
-                        img_element = video.query_selector("img.thumbnail__image")
-                        if img_element:
-                            title = img_element.get_attribute("alt")
-                            thumbnail = img_element.get_attribute("src")
-
-                        # Get video link
-                        link_element = video.query_selector("a.videostream__link.link")
-                        if link_element:
-                            link = "https://rumble.com" + link_element.get_attribute("href")
-                            
-                            if title and link:
-                                print(f"Processing video {len(all_videos) + 1}: {title}")
-                                all_videos.append({
-                                    "title": title.strip(),
-                                    "link": link,
-                                    "thumbnail": thumbnail,
-                                    "uploader": "https://warroom.org"
-                                })
-
-                                # Save every VIDEOS_PER_SAVE videos
-                                if len(all_videos) % VIDEOS_PER_SAVE == 0:
-                                    print(f"\nReached {len(all_videos)} videos, saving checkpoint...")
-                                    save_to_json(all_videos)
+                for row in rows:
+                    video = rumble_video(row)
+                    if video:
+                        print(f"Processing video {len(all_videos) + 1}: {video['title']}")
+                        all_videos.append(video)
 
-                    except Exception as e:
-                        print(f"Error processing video: {str(e)}")
-                        continue
+                        # Save every VIDEOS_PER_SAVE videos
+                        if len(all_videos) % VIDEOS_PER_SAVE == 0:
+                            print(f"\nReached {len(all_videos)} videos, saving checkpoint...")
+                            save_to_json(all_videos)
 
                 # Look for next page button using the correct selector
                 print("\nLooking for next page button...")
-                current_page_span = page.query_selector(f"span.paginator--link.paginator--link--current")
-                if current_page_span:
-                    current_number = current_page_span.get_attribute("aria-label")
-                    next_page = int(current_number) + 1
+                if current_number:
+                    next_page = current_number + 1
                     print(f"Current page is {current_number}, looking for page {next_page}...")
                     
                     # Try to find and click the next page number
                     next_url = f"{URL}?page={next_page}"
                     print(f"Navigating to page {next_page}...")
-                    page.goto(next_url, timeout=30000, wait_until='networkidle')
+                    call_with_retries(lambda: check_response(next_url, load_page(page, next_url, "span.paginator--link--current", timeout=30000)))
                     
                     # Verify we're on the new page
-                    new_page_span = page.query_selector(f"span.paginator--link.paginator--link--current")
-                    if new_page_span and new_page_span.get_attribute("aria-label") == str(next_page):
+                    _, new_number = rumble_pages(extract_items(page, RUMBLE_PAGINATOR))
+                    if new_number == next_page:
                         print(f"Successfully moved to page {next_page}")
                         current_page = next_page
                     else:
@@ -120,8 +114,10 @@ def scrape_rumble():
             # Final save
             if len(all_videos) > 0:
                 save_to_json(all_videos)
+            metrics.inc('videos_total', len(all_videos))
             
             print(f"\nCompleted scraping with {len(all_videos)} total videos")
+            print(f"Traffic: {traffic.get_stats()}")
             print("First 5 videos in order:")
             for i, video in enumerate(all_videos[:5], 1):
                 print(f"{i}. {video['title']}")
@@ -134,5 +130,130 @@ def scrape_rumble():
         finally:
             browser.close()
 
+async def scrape_page_async(pool, page_num):
+    """Return (video rows, paginator page numbers) for one channel page; no rows past the end"""
+    url = f"{URL}?page={page_num}" if page_num > 1 else URL
+    async with pool.page() as page:
+        check_response(url, await load_page_async(page, url, "ol.thumbnail__grid", timeout=30000))
+        rows = await extract_items_async(page, RUMBLE_VIDEOS)
+        numbers, current = rumble_pages(await extract_items_async(page, RUMBLE_PAGINATOR))
+    # Rumble serves the last page again for numbers past the end
+    if page_num > 1 and current != page_num:
+        return [], numbers
+    return rows, numbers
+
+async def scrape_rumble_parallel(concurrency=PARALLEL_PAGES, memory_budget=MEMORY_BUDGET_MB):
+    """Backfill the whole channel with `concurrency` pages loading at once.
+
+    Page 1 tells us roughly how many pages there are; every page's paginator
+    can push that further. Pages finish in any order but are merged strictly
+    in page order, so the output and the VIDEOS_PER_SAVE checkpoints match
+    the sequential scrape_rumble().
+    """
+    print(f"Starting parallel scrape of {URL} ({concurrency} pages at a time)")
+    all_videos = []
+    seen_links = set()
+    done = {}  # page_num -> rows, waiting for the pages before it
+    in_flight = {}  # task -> page_num
+    next_page = next_merge = 1
+    last_page = 1  # Highest page number any paginator has shown so far
+    end_page = None  # First page that came back empty or failed
+    failed_page = None  # First page that still failed after its retries
+
+    async with async_playwright() as p:
+        pool = await BrowserPool(p, concurrency).start()
+        watchdog = MemoryWatchdog(pool, memory_budget).start()
+        controller = RateController(AdaptiveLimiter(initial=concurrency, max_limit=concurrency))
+        try:
+            while True:
+                # Don't run further ahead of the merge point than a couple of rounds
+                while (len(in_flight) < concurrency and next_page <= last_page
+                       and (end_page is None or next_page < end_page)
+                       and next_page - next_merge < concurrency * 2):
+                    url = f"{URL}?page={next_page}"
+                    task = asyncio.create_task(controller.call(url, scrape_page_async, pool, next_page))
+                    in_flight[task] = next_page
+                    next_page += 1
+                if not in_flight:
+                    break
+
+                finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    page_num = in_flight.pop(task)
+                    try:
+                        rows, numbers = task.result()
+                    except Exception as e:
+                        # Stop merging at the gap; everything before it is still saved
+                        print(f"Page {page_num} failed after retries: {str(e)}")
+                        metrics.inc('listing_page_failures_total')
+                        if failed_page is None or page_num < failed_page:
+                            failed_page = page_num
+                        if end_page is None or page_num < end_page:
+                            end_page = page_num
+                        continue
+                    metrics.inc('listing_pages_total')
+                    print(f"Found {len(rows)} videos on page {page_num}")
+                    if numbers and max(numbers) > last_page:
+                        last_page = max(numbers)
+                        print(f"Detected approximately {last_page} total pages")
+                    if not rows and (end_page is None or page_num < end_page):
+                        end_page = page_num
+                    done[page_num] = rows
+
+                while next_merge in done and (end_page is None or next_merge < end_page):
+                    for row in done.pop(next_merge):
+                        video = rumble_video(row)
+                        if video and video['link'] not in seen_links:
+                            seen_links.add(video['link'])
+                            all_videos.append(video)
+
+                            # Save every VIDEOS_PER_SAVE videos
+                            if len(all_videos) % VIDEOS_PER_SAVE == 0:
+                                print(f"\nReached {len(all_videos)} videos, saving checkpoint...")
+                                save_to_json(all_videos)
+                    next_merge += 1
+
+            # Final save
+            if len(all_videos) > 0:
+                save_to_json(all_videos)
+            metrics.inc('videos_total', len(all_videos))
+
+            print(f"\nCompleted scraping {next_merge - 1} pages with {len(all_videos)} total videos")
+            if failed_page is not None and failed_page == end_page:
+                print(f"Stopped at page {failed_page}, which failed; rerun to continue the backfill")
+            print(f"Browser pool stats: {pool.get_stats()}")
+            print(f"Rate control: {controller.get_stats()}")
+
+        except Exception as e:
+            print(f"Error during scraping: {str(e)}")
+            if len(all_videos) > 0:
+                # Only pages merged in order are included, so a rerun can pick up cleanly
+                print("Saving videos collected so far...")
+                save_to_json(all_videos)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            await watchdog.stop()
+            print(f"Memory: {watchdog.get_stats()}")
+            await pool.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Scrape every video on the War Room Rumble channel')
+    parser.add_argument('--parallel', type=int, metavar='N', default=0,
+                        help=f'load N pages at once (e.g. {PARALLEL_PAGES}) instead of walking them one by one')
+    memory_watchdog.add_argument(parser)
+    profiling.add_argument(parser)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    scrape_rumble() 
\ No newline at end of file
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    try:
+        if args.parallel > 0:
+            asyncio.run(scrape_rumble_parallel(args.parallel, args.memory_budget))
+        else:
+            scrape_rumble()
+    finally:
+        metrics.write_run_summary('fresh_warroom_scraper')
\ No newline at end of file
@@ -1,233 +1,194 @@
+import argparse
+import hashlib
 import json
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from article_corpus import iter_articles, write_json_atomic
+from page_template import TEMPLATE_HASH, write_article_page
+import metrics
+import profiling
 
-def generate_article_html(article):
-    try:
-        html_content = f"""<!DOCTYPE HTML>
-<html>
-<head>
-    <title>{article['title']} - Natalie Winters</title>
-    <meta charset="utf-8" />
-    <meta name="viewport" content="width=device-width, initial-scale=1, user-scalable=no" />
-    <meta name="description" content="{article['excerpt']}" />
-    <link rel="icon" type="image/icon" href="/favicon.ico">
-    <link rel="stylesheet" href="/assets/css/main.css" />
-    <link rel="stylesheet" href="/assets/css/fontawesome-all.min.css" />
-    <noscript><link rel="stylesheet" href="/assets/css/noscript.css" /></noscript>
-    <style>
-        .article-container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        .article-header {{
-            text-align: center;
-            margin-bottom: 40px;
-        }}
-        .article-title {{
-            font-size: 36px;
-            margin-bottom: 20px;
-            color: #333;
-        }}
-        .article-meta {{
-            font-size: 16px;
-            color: #666;
-            margin-bottom: 30px;
-        }}
-        .article-content {{
-            font-size: 18px;
-            line-height: 1.8;
-            color: #444;
-        }}
-        .article-excerpt {{
-            font-size: 20px;
-            line-height: 1.6;
-            color: #666;
-            margin: 30px 0;
-            font-style: italic;
-            border-left: 4px solid #e44c65;
-            padding-left: 20px;
-        }}
-        .article-footer {{
-            margin-top: 40px;
-            padding-top: 20px;
-            border-top: 1px solid #eee;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }}
-        .back-to-articles {{
-            display: inline-block;
-            padding: 10px 20px;
-            background: #e44c65;
-            color: #fff !important;
-            text-decoration: none;
-            border-radius: 4px;
-            transition: background 0.3s ease;
-        }}
-        .back-to-articles:hover {{
-            background: #d83850;
-        }}
-        .source-link {{
-            display: inline-block;
-            padding: 10px 20px;
-            background: #333;
-            color: #fff !important;
-            text-decoration: none;
-            border-radius: 4px;
-            transition: background 0.3s ease;
-        }}
-        .source-link:hover {{
-            background: #444;
-        }}
-    </style>
-</head>
-<body class="homepage is-preload">
-    <div id="page-wrapper">
-        <!-- Header -->
-        <div id="header">
-            <div class="inner">
-                <header>
-                    <h1><a href="/" id="logo">Natalie Winters</a></h1>
-                    <hr />
-                    <p>Investigative Reporter & White House Correspondent</p>
-                </header>
-                <div class="sponsor-images">
-                    <img src="/images/war_path_coffee_logo.jpg" alt="War Path Coffee" />
-                    <img src="/images/my_pillow_logo.jpg" alt="My Pillow" />
-                    <img src="/images/sacred_human_health_logo.jpg" alt="Sacred Human Health" />
-                    <img src="/images/meriwether_farms_logo.jpg" alt="Meriwether Farms" />
-                    <img src="/images/shes_so_right_logo.jpg" alt="She's So Right" />
-                    <img src="/images/stand_with_bannon.jpg" alt="Stand with Bannon" />
-                </div>
-            </div>
-
-            <!-- Nav -->
-            <nav id="nav">
-                <ul>
-                    <li><a href="/">Home</a></li>
-                    <li><a href="#">Videos</a>
-                        <ul>
-                            <li><a href="/videos.html">Natalie Winters Videos</a></li>
-                            <li><a href="/warroom-videos.html">Warroom Videos</a></li>
-                        </ul>
-                    </li>
-                    <li><a href="/wedding.html">Wedding</a></li>
-                    <li><a href="https://shessoright.co/" target="_blank" rel="noopener noreferrer">Shop</a></li>
-                    <li><a href="/about.html">About</a></li>
-                    <li><a href="https://warroom.org/contact/" target="_blank" rel="noopener noreferrer">Contact</a></li>
-                </ul>
-            </nav>
-        </div>
+ARTICLES_FILE = 'public/warroom-articles.json'
+OUTPUT_DIR = 'public/warroom-articles'
+MANIFEST_FILE = 'article-pages-manifest.json'
+BATCH_SIZE = 16  # Articles per pool task, amortises pickling overhead
+# Fields of an article that end up in its page
+PAGE_FIELDS = ('title', 'excerpt', 'author', 'publishedDate', 'content', 'sourceUrl', 'fileName')
 
-        <div class="wrapper style2">
-            <article id="main" class="container special">
-                <div class="article-container">
-                    <article>
-                        <div class="article-header">
-                            <h1 class="article-title">{article['title']}</h1>
-                            <div class="article-meta">
-                                By {article['author']} | {article['publishedDate']}
-                            </div>
-                        </div>
-                        
-                        <div class="article-excerpt">
-                            {article['excerpt']}
-                        </div>
-                        
-                        <div class="article-content">
-                            {article['content']}
-                        </div>
-                        
-                        <div class="article-footer">
-                            <a href="/warroom-articles/" class="back-to-articles">← Back to Articles</a>
-                            <a href="{article['sourceUrl']}" class="source-link" target="_blank" rel="noopener noreferrer">Read Original Article →</a>
-                        </div>
-                    </article>
-                </div>
-            </article>
-        </div>
+def article_hash(article):
+    inputs = {field: article.get(field) for field in PAGE_FIELDS}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
 
-        <!-- Footer -->
-        <div id="footer">
-            <div class="container">
-                <div class="row">
-                    <div class="col-12">
-                        <!-- Contact -->
-                        <section class="contact">
-                            <header>
-                                <h3>Natalie Winters Social Media</h3>
-                            </header>
-                            <p>Follow @NatalieGWinters on all platforms & buy her a coffee.</p>
-                            <ul class="icons">
-                                <li><a href="https://x.com/nataliegwinters" target="_blank" rel="noopener noreferrer" class="icon brands fa-twitter"><span class="label">Twitter</span></a></li>
-                                <li><a href="https://www.instagram.com/nataliegwinters/" target="_blank" rel="noopener noreferrer" class="icon brands fa-instagram"><span class="label">Instagram</span></a></li>
-                            </ul>
-                        </section>
-                        
-                        <!-- Copyright -->
-                        <div class="copyright">
-                            <ul class="menu">
-                                <li>&copy; <a href="https://app.companiesoffice.govt.nz/companies/app/service/services/documents/EA487ACCCF57D6444298C67F09ECA876/CertIncorporation_9272491_05February2025.pdf" target="_blank" rel="noopener noreferrer">America First New Zealand</a></li>
-                                <li><a href="https://github.com/meeeeeooooowwwwwww" target="_blank" rel="noopener noreferrer">Web Design: meeeeeooooowwwwwww</a></li>
-                            </ul>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </div>
+def load_manifest():
+    """Return {fileName: input hash} for pages built with the current template"""
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}, {}
+    pages = manifest.get('pages', {})
+    if manifest.get('template') != TEMPLATE_HASH:
+        print("Template changed since the last build, regenerating every page")
+        return {}, pages
+    return pages, pages
 
-        <!-- Scripts -->
-        <script src="/assets/js/jquery.min.js"></script>
-        <script src="/assets/js/jquery.dropotron.min.js"></script>
-        <script src="/assets/js/jquery.scrolly.min.js"></script>
-        <script src="/assets/js/jquery.scrollex.min.js"></script>
-        <script src="/assets/js/browser.min.js"></script>
-        <script src="/assets/js/breakpoints.min.js"></script>
-        <script src="/assets/js/util.js"></script>
-        <script src="/assets/js/main.js"></script>
-    </div>
-</body>
-</html>"""
-        
-        file_path = os.path.join('public/warroom-articles', article['fileName'])
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+def generate_article_html(article):
+    try:
+        write_article_page(article, OUTPUT_DIR)
         return True
     except Exception as e:
         print(f"Error generating article {article.get('fileName', 'unknown')}: {str(e)}")
         return False
 
-def main():
+def generate_one(article):
+    start = time.perf_counter()
+    with profiling.section('page_render'):
+        ok = generate_article_html(article)
+    return article.get('fileName'), ok, time.perf_counter() - start
+
+def generate_batch(articles):
+    """Render a shard of articles; runs inside a pool worker"""
+    return [generate_one(article) for article in articles]
+
+def iter_batches(articles, size):
+    batch = []
+    for article in articles:
+        batch.append(article)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def generate_parallel(articles, workers, use_threads=False):
+    """Yield (fileName, success, seconds) in input order, rendering shards across a pool"""
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        # Bounded window of shards in flight keeps memory flat on big archives
+        in_flight = deque()
+        for batch in iter_batches(articles, BATCH_SIZE):
+            in_flight.append(executor.submit(generate_batch, batch))
+            if len(in_flight) >= workers * 4:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate static HTML pages for War Room articles')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of parallel workers (1 renders in this process)')
+    parser.add_argument('--threads', action='store_true',
+                        help='use a thread pool instead of a process pool')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every page even if its inputs are unchanged')
+    profiling.add_argument(parser)
+    return parser.parse_args()
+
+def main(workers=1, use_threads=False, force=False):
     print("Starting article generation...")
     
-    # Read the articles JSON file
-    try:
-        with open('public/warroom-articles.json', 'r', encoding='utf-8') as f:
-            articles = json.load(f)
-        print(f"Loaded {len(articles)} articles from JSON file")
-    except Exception as e:
-        print(f"Error loading JSON file: {str(e)}")
-        return
+    if not os.path.exists(ARTICLES_FILE):
+        print(f"Error loading JSON file: {ARTICLES_FILE} not found")
+        return False
     
     # Create the warroom-articles directory if it doesn't exist
-    os.makedirs('public/warroom-articles', exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    
+    built, previous = load_manifest()
+    if force:
+        built = {}
+    pages = {}  # Manifest for this build
+    pending = {}  # fileName -> input hash of pages waiting to be rendered
+    unchanged_count = 0
+    load_error = None  # The JSON file couldn't be read to the end
+    render_error = None  # The pool failed, e.g. a worker died or an article couldn't be pickled
+    
+    def dirty_articles():
+        nonlocal unchanged_count, load_error
+        try:
+            for article in iter_articles(ARTICLES_FILE):
+                name = article.get('fileName')
+                digest = article_hash(article)
+                if name and built.get(name) == digest and os.path.exists(os.path.join(OUTPUT_DIR, name)):
+                    pages[name] = digest
+                    unchanged_count += 1
+                    continue
+                pending[name] = digest
+                yield article
+        except (OSError, ValueError) as e:
+            # Stops the stream; pages already queued still finish rendering
+            load_error = e
     
-    # Generate HTML files for each article
+    # Generate HTML files for new or changed articles, streaming them from the JSON file
     success_count = 0
     error_count = 0
     
-    for i, article in enumerate(articles, 1):
-        if generate_article_html(article):
-            success_count += 1
-            if success_count % 10 == 0:  # Print progress more frequently
-                print(f"Generated {success_count} articles so far...")
-        else:
-            error_count += 1
+    if workers > 1:
+        print(f"Rendering with {workers} {'threads' if use_threads else 'processes'}")
+        results = generate_parallel(dirty_articles(), workers, use_threads)
+    else:
+        results = (generate_one(article) for article in dirty_articles())
     
+    try:
+        for name, ok, seconds in results:
+            metrics.record_stage('page_render', seconds, ok)
+            digest = pending.pop(name, None)
+            if ok:
+                pages[name] = digest
+                success_count += 1
+                if success_count % 10 == 0:  # Print progress more frequently
+                    print(f"Generated {success_count} articles so far...")
+            else:
+                # Keep the old page and its entry; None (no valid build) makes the next run retry it
+                pages[name] = built.get(name)
+                error_count += 1
+    except Exception as e:
+        print(f"Error rendering articles: {type(e).__name__}: {str(e)}")
+        render_error = e
+    if load_error:
+        print(f"Error loading JSON file: {str(load_error)}")
+    
+    # Pages whose article disappeared from the JSON (skipped if the JSON was unreadable)
+    removed_count = 0
+    if load_error is None and render_error is None:
+        for name in previous:
+            if name not in pages and name not in pending:
+                path = os.path.join(OUTPUT_DIR, name)
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed_count += 1
+    if load_error is None:
+        if render_error is not None:
+            # Articles the pool never got to keep their old entries, so their pages aren't orphaned later
+            for name, digest in previous.items():
+                pages.setdefault(name, built.get(name))
+        with metrics.stage('manifest_write'):
+            write_json_atomic(MANIFEST_FILE, {'template': TEMPLATE_HASH, 'pages': pages}, indent=2)
+    
+    print(f"Loaded {success_count + error_count + unchanged_count} articles from JSON file")
     print(f"\nGeneration complete:")
     print(f"Successfully generated: {success_count} articles")
+    print(f"Unchanged (skipped): {unchanged_count} articles")
+    print(f"Removed orphaned pages: {removed_count}")
     print(f"Errors encountered: {error_count} articles")
+    metrics.inc('pages_total', success_count, result='generated')
+    metrics.inc('pages_total', unchanged_count, result='unchanged')
+    metrics.inc('pages_total', removed_count, result='removed')
+    metrics.inc('pages_total', error_count, result='error')
+    return load_error is None and render_error is None
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    args = parse_args()
+    if args.profile:
+        # Pages have to render in this process to be profiled
+        args.workers = 1
+        profiling.start()
+    try:
+        ok = main(workers=args.workers, use_threads=args.threads, force=args.force)
+    finally:
+        metrics.write_run_summary('generate_article_pages')
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,209 @@
+import re
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+ALLOWED_TAGS = frozenset([
+    'p', 'a', 'b', 'strong', 'i', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'ul', 'ol', 'li', 'blockquote', 'img', 'article', 'section', 'figure',
+    'figcaption', 'div', 'span'
+])
+ALLOWED_ATTRS = frozenset(['href', 'src', 'alt'])
+DROPPED_TAGS = frozenset(['script', 'style', 'iframe'])  # Removed with everything inside
+PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+    'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'
+])
+ASCII_SPACES = ' \n\t\x0c\r'
+FRAGMENT_ROOT = 'sanitize-root'
+
+BLANK_LINES = re.compile(r'\n\s*\n')
+SPACE_BETWEEN_TAGS = re.compile(r'>\s+<')
+
+
+def _escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _quote_attr(value):
+    value = _escape_text(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', '&quot;') + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+class _Frame:
+    __slots__ = ('tag', 'attrs', 'parts', 'has_text', 'has_img', 'dropped')
+
+    def __init__(self, tag, attrs, dropped):
+        self.tag = tag
+        self.attrs = attrs
+        self.parts = []
+        self.has_text = False
+        self.has_img = False
+        self.dropped = dropped
+
+
+class SanitizingTarget:
+    """Parser target that sanitizes HTML in a single bottom-up pass.
+
+    Nothing is kept but a stack of open elements. When an element closes,
+    its already-sanitized children are either serialized inside it (allowed
+    tag), spliced into the parent (unwrapped tag) or thrown away (dropped
+    tag, or no text and no image below it), so allow-listing, attribute
+    filtering and empty-node pruning all happen in the same traversal.
+    """
+
+    def __init__(self):
+        self.stack = [_Frame(None, None, False)]
+        self.text = []
+        self.preserve_depth = 0
+
+    def _flush_text(self):
+        if not self.text:
+            return
+        text = ''.join(self.text)
+        self.text = []
+        frame = self.stack[-1]
+        if frame.dropped:
+            return
+        # Whitespace-only runs collapse to one space or newline, as BeautifulSoup does
+        if not self.preserve_depth and not text.strip(ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+        if text.strip():
+            frame.has_text = True
+        frame.parts.append(_escape_text(text))
+
+    def start(self, tag, attrib):
+        self._flush_text()
+        parent = self.stack[-1]
+        attrs = [(key, value or '') for key, value in attrib.items() if key in ALLOWED_ATTRS]
+        self.stack.append(_Frame(tag, attrs, parent.dropped or tag in DROPPED_TAGS))
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth += 1
+
+    def end(self, tag):
+        self._flush_text()
+        if len(self.stack) > 1:
+            self._close(self.stack.pop())
+
+    def _close(self, frame):
+        if frame.tag in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth -= 1
+        parent = self.stack[-1]
+        if frame.dropped:
+            return
+
+        parent.has_text = parent.has_text or frame.has_text
+        parent.has_img = parent.has_img or frame.has_img or frame.tag == 'img'
+
+        if frame.tag not in ALLOWED_TAGS:
+            parent.parts.extend(frame.parts)  # unwrap
+        elif (frame.has_text or frame.has_img) and frame.tag != 'img':
+            attrs = ''.join(f' {key}={_quote_attr(value)}' for key, value in frame.attrs)
+            parent.parts.append(f'<{frame.tag}{attrs}>')
+            parent.parts.extend(frame.parts)
+            parent.parts.append(f'</{frame.tag}>')
+        # else: no text and no image inside, prune it
+
+    def data(self, text):
+        self.text.append(text)
+
+    def comment(self, text):
+        self._flush_text()
+        if not self.stack[-1].dropped:
+            self.stack[-1].parts.append(f'<!--{text}-->')
+
+    def pi(self, target, data=None):
+        self._flush_text()
+        if not self.stack[-1].dropped:
+            self.stack[-1].parts.append(f'<?{target} {data}>' if data else f'<?{target}>')
+
+    def close(self):
+        self._flush_text()
+        while len(self.stack) > 1:
+            self._close(self.stack.pop())
+        return ''.join(self.stack[0].parts)
+
+
+class _StdlibDriver(HTMLParser):
+    """Feeds a SanitizingTarget from html.parser with BeautifulSoup's nesting rules"""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+        self.open_tags = []
+        self.closed_voids = []
+
+    def handle_starttag(self, tag, attrs, self_closing=False):
+        attrib = {}
+        for key, value in attrs:
+            attrib[key] = value  # Last duplicate wins
+        self.target.start(tag, attrib)
+        self.open_tags.append(tag)
+        if tag in VOID_TAGS and not self_closing:
+            self._pop_to(tag)
+            self.closed_voids.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, self_closing=True)
+        self._pop_to(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_voids:
+            self.closed_voids.remove(tag)
+        else:
+            self._pop_to(tag)
+
+    def _pop_to(self, tag):
+        # An end tag closes everything up to its most recent match; stray ones are ignored
+        if tag not in self.open_tags:
+            return
+        while self.open_tags:
+            name = self.open_tags.pop()
+            self.target.end(name)
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def handle_comment(self, data):
+        self.target.comment(data)
+
+    def handle_pi(self, data):
+        self.target.pi(data)
+
+
+def sanitize_html(html_content, parser='lxml'):
+    """Allow-list tags and attributes and prune empty nodes in one pass.
+
+    `parser='lxml'` uses libxml2 and is the fast path; `'html.parser'` uses
+    the standard library and is used automatically when lxml is missing.
+    """
+    target = SanitizingTarget()
+    if parser == 'lxml' and LXML_AVAILABLE:
+        # The wrapper keeps libxml2 from inventing a <p> around leading text;
+        # it isn't an allowed tag, so it is unwrapped like <html> and <body>
+        cleaned_html = etree.fromstring(
+            f'<{FRAGMENT_ROOT}>{html_content}</{FRAGMENT_ROOT}>',
+            etree.HTMLParser(target=target)
+        )
+    else:
+        driver = _StdlibDriver(target)
+        driver.feed(html_content)
+        driver.close()
+        while driver.open_tags:
+            target.end(driver.open_tags.pop())
+        cleaned_html = target.close()
+
+    cleaned_html = BLANK_LINES.sub('\n', cleaned_html)
+    return SPACE_BETWEEN_TAGS.sub('>\n<', cleaned_html)
@@ -0,0 +1,85 @@
+# Selector definitions for the listing pages we scrape, and a single
+# page.evaluate() that pulls every field of every item in one round-trip.
+#
+# A spec is {'item': <selector for each entry>, 'fields': {name: (selector, source)}}
+# where source is 'text' (innerText, like Playwright's inner_text()) or the
+# name of an attribute (raw value, like get_attribute()). A selector of None
+# reads the item element itself. Missing elements come back as None.
+
+WARROOM_PREVIEWS = {
+    'item': 'article.jeg_post',
+    'fields': {
+        'url': ('h3.jeg_post_title a', 'href'),
+        'title': ('h3.jeg_post_title a', 'text'),
+        'excerpt': ('.jeg_post_excerpt p', 'text'),
+        'author': ('.jeg_meta_author a', 'text'),
+        'date': ('.jeg_meta_date', 'text'),
+    },
+}
+
+RUMBLE_VIDEOS = {
+    'item': 'ol.thumbnail__grid div.thumbnail__thumb',
+    'fields': {
+        'title': ('img.thumbnail__image', 'alt'),
+        'thumbnail': ('img.thumbnail__image', 'src'),
+        'link': ('a.videostream__link.link', 'href'),
+    },
+}
+
+RUMBLE_PAGINATOR = {
+    'item': 'span.paginator--link',
+    'fields': {
+        'label': (None, 'aria-label'),
+        'class': (None, 'class'),
+    },
+}
+
+EXTRACT_ITEMS_JS = """
+([itemSelector, fields]) => Array.from(document.querySelectorAll(itemSelector), item => {
+    const row = {};
+    for (const [name, [selector, source]] of Object.entries(fields)) {
+        const el = selector === null ? item : item.querySelector(selector);
+        row[name] = !el ? null : source === 'text' ? el.innerText : el.getAttribute(source);
+    }
+    return row;
+})
+"""
+
+
+def _args(spec):
+    return [spec['item'], {name: list(field) for name, field in spec['fields'].items()}]
+
+
+def extract_items(page, spec):
+    """Return a list of dicts, one per item on a sync Playwright page"""
+    return page.evaluate(EXTRACT_ITEMS_JS, _args(spec))
+
+
+async def extract_items_async(page, spec):
+    """Return a list of dicts, one per item on an async Playwright page"""
+    return await page.evaluate(EXTRACT_ITEMS_JS, _args(spec))
+
+
+def rumble_video(row):
+    """Turn one RUMBLE_VIDEOS row into the video record we store, or None if incomplete"""
+    if not row['title'] or not row['link']:
+        return None
+    return {
+        "title": row['title'].strip(),
+        "link": "https://rumble.com" + row['link'],
+        "thumbnail": row['thumbnail'],
+        "uploader": "https://warroom.org"
+    }
+
+
+def rumble_pages(rows):
+    """Return (page numbers shown in a RUMBLE_PAGINATOR extract, current page or None)"""
+    numbers = []
+    current = None
+    for row in rows:
+        label = row['label']
+        if label and label.isdigit():
+            numbers.append(int(label))
+            if 'paginator--link--current' in (row['class'] or '').split():
+                current = int(label)
+    return numbers, current
@@ -0,0 +1,130 @@
+"""Keeps a crawl inside a memory budget by recycling the browser pool.
+
+Chromium's renderers grow over a long crawl even with tabs recycled every
+few dozen pages. The watchdog samples the RSS of this process and of every
+process under it (the Playwright driver and Chromium's whole tree) and,
+when the total goes over budget, first drains the pool so every context is
+closed, then relaunches the browser if that was not enough.
+
+RSS counts shared pages once per process, so the total overstates what the
+kernel actually has to find; the budget errs on the safe side.
+"""
+import asyncio
+
+import psutil
+
+import metrics
+
+MEMORY_BUDGET_MB = 1536
+SAMPLE_INTERVAL = 5.0  # seconds
+ACTIONS = ('contexts', 'browser')  # What to recycle on each consecutive sample over budget
+
+
+def sample_rss():
+    """RSS in bytes of this process and of all of its descendants"""
+    process = psutil.Process()
+    own = process.memory_info().rss
+    children = 0
+    for child in process.children(recursive=True):
+        try:
+            children += child.memory_info().rss
+        except psutil.Error:
+            # Renderers come and go between listing and reading them
+            pass
+    return own, children
+
+
+class MemoryWatchdog:
+    """Samples memory in the background while a BrowserPool is in use.
+
+    `budget_mb` of 0 only measures. Start it once the pool is up and stop it
+    before closing the pool; peak and average memory go into the metrics
+    summary.
+    """
+
+    def __init__(self, pool, budget_mb=MEMORY_BUDGET_MB, interval=SAMPLE_INTERVAL):
+        self.pool = pool
+        self.budget = budget_mb * 2**20
+        self.interval = interval
+        self.samples = 0
+        self.peak = {'python': 0, 'browser': 0, 'total': 0}
+        self.sums = {'python': 0, 'browser': 0, 'total': 0}
+        self.recycles = {action: 0 for action in ACTIONS}
+        self._step = 0  # Index into ACTIONS while consecutive samples stay over budget
+        self._task = None
+
+    def start(self):
+        if self.budget:
+            metrics.set_gauge('memory_budget_bytes', self.budget)
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self.record()
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def _observe(self, python, browser):
+        current = {'python': python, 'browser': browser, 'total': python + browser}
+        self.samples += 1
+        for name, value in current.items():
+            self.peak[name] = max(self.peak[name], value)
+            self.sums[name] += value
+            metrics.set_gauge('memory_rss_bytes', value, process=name)
+        return current['total']
+
+    async def _recycle(self, total):
+        if self._step >= len(ACTIONS):
+            # Recycling didn't bring it down; the memory is ours, not Chromium's
+            if self._step == len(ACTIONS):
+                print(f'Memory still over budget after relaunching the browser ({total // 2**20} MB)')
+                self._step += 1
+            return
+        action = ACTIONS[self._step]
+        self._step += 1
+        print(f'Memory {total // 2**20} MB over the {self.budget // 2**20} MB budget, recycling {action}...')
+        self.recycles[action] += 1
+        metrics.inc('memory_recycles_total', action=action)
+        await self.pool.drain(relaunch=action == 'browser')
+
+    async def _run(self):
+        while True:
+            try:
+                total = self._observe(*await asyncio.to_thread(sample_rss))
+            except psutil.Error as e:
+                print(f'Memory sample failed: {e}')
+                total = 0
+            if self.budget and total > self.budget:
+                await self._recycle(total)
+            else:
+                self._step = 0
+            await asyncio.sleep(self.interval)
+
+    def record(self):
+        """Put peak and average memory into the metrics summary"""
+        for name in self.peak:
+            metrics.set_gauge('memory_peak_bytes', self.peak[name], process=name)
+            metrics.set_gauge('memory_avg_bytes', self.sums[name] // max(self.samples, 1), process=name)
+
+    def get_stats(self):
+        return {
+            'samples': self.samples,
+            'peak_mb': self.peak['total'] // 2**20,
+            'avg_mb': self.sums['total'] // max(self.samples, 1) // 2**20,
+            'budget_mb': self.budget // 2**20,
+            'recycles': dict(self.recycles)
+        }
+
+
+def add_argument(parser):
+    parser.add_argument('--memory-budget', type=int, metavar='MB', default=MEMORY_BUDGET_MB,
+                        help='recycle browser contexts, then the browser, when this process and its '
+                             f'children use more (default {MEMORY_BUDGET_MB}, 0 to only measure)')
@@ -0,0 +1,200 @@
+"""Counters, latency histograms and in-flight gauges for the scraping and build scripts.
+
+Every script records into the module-level registry and calls
+write_run_summary() once at the end of the run, which writes
+
+    metrics/<job>.prom   Prometheus text format, for node_exporter's textfile collector
+    metrics/<job>.json   the same numbers as a readable run summary, with percentiles
+
+Pipeline stages are timed with
+
+    with metrics.stage('navigate', host=metrics.host_of(url)):
+        ...
+
+which counts the call by outcome, records its latency and keeps an
+in-flight gauge (current and peak) for the stage and host. It works the
+same around awaits in async code.
+"""
+import bisect
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import profiling
+from article_corpus import atomic_open, write_json_atomic
+
+METRICS_DIR = 'metrics'
+METRIC_PREFIX = 'warroom_'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SAMPLE_LIMIT = 10000  # Latency samples kept per series for the percentiles in the summary
+
+
+def host_of(url):
+    return (urlsplit(url).hostname or '') if url else ''
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = []  # Reservoir sample for percentiles
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        if len(self.samples) < SAMPLE_LIMIT:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < SAMPLE_LIMIT:
+                self.samples[slot] = value
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Registry:
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        self.gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name, delta, **labels):
+        key = (name, _label_key(labels))
+        self.gauges[key] = self.gauges.get(key, 0) + delta
+        peak = ('peak_' + name, key[1])
+        self.gauges[peak] = max(self.gauges.get(peak, 0), self.gauges[key])
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    @contextmanager
+    def stage(self, stage, host=None):
+        """Time one pass through a pipeline stage and count it as ok or error"""
+        self.add_gauge('stage_in_flight', 1, stage=stage, host=host)
+        profile = profiling.enter(stage) if profiling.ACTIVE else None
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record_stage(stage, time.perf_counter() - start, ok, host)
+            self.add_gauge('stage_in_flight', -1, stage=stage, host=host)
+            if profile:
+                profiling.leave(profile)
+
+    def record_stage(self, stage, seconds, ok=True, host=None):
+        """Record a stage pass timed elsewhere, e.g. in a worker process"""
+        self.observe('stage_seconds', seconds, stage=stage, host=host)
+        self.inc('stage_total', stage=stage, host=host, status='ok' if ok else 'error')
+
+    def render_prometheus(self, job):
+        job_label = (('job', job),)
+        lines = []
+        for kind, series in (('counter', self.counters), ('gauge', self.gauges)):
+            for name in sorted({name for name, _ in series}):
+                metric = METRIC_PREFIX + name
+                lines.append(f'# TYPE {metric} {kind}')
+                for (series_name, key), value in sorted(series.items()):
+                    if series_name == name:
+                        lines.append(f'{metric}{_format_labels(key, job_label)} {value}')
+        for name in sorted({name for name, _ in self.histograms}):
+            metric = METRIC_PREFIX + name
+            lines.append(f'# TYPE {metric} histogram')
+            for (series_name, key), histogram in sorted(self.histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{_format_labels(key, job_label + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{metric}_sum{_format_labels(key, job_label)} {histogram.sum}')
+                lines.append(f'{metric}_count{_format_labels(key, job_label)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, job):
+        def labelled(key):
+            return ','.join(f'{name}={value}' for name, value in key) or '-'
+
+        finished = time.time()
+        return {
+            'job': job,
+            'started': datetime.utcfromtimestamp(self.started).isoformat(),
+            'finished': datetime.utcfromtimestamp(finished).isoformat(),
+            'duration_seconds': round(finished - self.started, 3),
+            'counters': {f'{name}[{labelled(key)}]': value for (name, key), value in sorted(self.counters.items())},
+            'gauges': {f'{name}[{labelled(key)}]': value for (name, key), value in sorted(self.gauges.items())},
+            'latency': {
+                f'{name}[{labelled(key)}]': {
+                    'count': histogram.count,
+                    'mean': round(histogram.sum / histogram.count, 4) if histogram.count else 0,
+                    'p50': round(histogram.percentile(0.5), 4),
+                    'p90': round(histogram.percentile(0.9), 4),
+                    'p99': round(histogram.percentile(0.99), 4),
+                    'max': round(histogram.max, 4)
+                }
+                for (name, key), histogram in sorted(self.histograms.items())
+            }
+        }
+
+    def write(self, job, directory=METRICS_DIR):
+        duration = time.time() - self.started
+        self.set_gauge('run_duration_seconds', round(duration, 3))
+        self.set_gauge('run_finished_timestamp_seconds', int(time.time()))
+        with atomic_open(os.path.join(directory, f'{job}.prom')) as f:
+            f.write(self.render_prometheus(job))
+        summary = self.summary(job)
+        write_json_atomic(os.path.join(directory, f'{job}.json'), summary, indent=2)
+        slowest = sorted(summary['latency'].items(), key=lambda item: -item[1]['count'] * item[1]['mean'])[:5]
+        print(f'Metrics written to {directory}/{job}.prom and {job}.json')
+        for name, stats in slowest:
+            print(f"  {name}: {stats['count']} calls, p50 {stats['p50']}s, p99 {stats['p99']}s")
+
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+stage = REGISTRY.stage
+record_stage = REGISTRY.record_stage
+
+
+def write_run_summary(job, directory=METRICS_DIR):
+    """Write the metrics files, and the profiles too when running with --profile"""
+    REGISTRY.write(job, directory)
+    profiling.write(job)
@@ -0,0 +1,468 @@
+"""Build a chunked, deduplicated training corpus from the NatBot text and the articles.
+
+Inputs are streamed: the article corpus one article at a time and the
+NatBot part files line by line, as one continuous stream, because the
+parts are arbitrary splits that can cut a document in two. Documents
+are split into paragraph-aligned chunks with stable content-derived IDs.
+Chunks are then deduplicated twice:
+
+  * exact: SHA-256 of the normalised text
+  * near:  MinHash signatures over word shingles, bucketed with LSH bands;
+           a candidate is a duplicate when its estimated Jaccard
+           similarity reaches NEAR_DUP_THRESHOLD
+
+Articles go first, so when the NatBot files repeat an article the
+structured copy is the one kept. Kept chunks are written as JSONL shards
+of about SHARD_BYTES each, listed in natbot-corpus/manifest.json.
+
+The signatures and hashes of everything kept are saved in the output
+directory, so a rerun only reads articles and part files it has not seen
+before and appends their new chunks. An article whose text changed has
+its old chunks removed from the shards (and from the deduplicator) before
+the new version is chunked; a change to any NatBot part file does the same
+for all the NatBot chunks, since the parts are one stream. Use --rebuild to
+start over.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from array import array
+from datetime import datetime
+
+from article_corpus import SITE_ARTICLES_FILE, atomic_open, iter_articles, write_json_atomic
+from search_index import NATBOT_DIR, html_to_text
+import metrics
+import profiling
+
+NATBOT_CORPUS_DIR = 'natbot-corpus'
+CHUNK_WORDS = 250  # Paragraphs are grouped until a chunk reaches about this many words
+MAX_CHUNK_WORDS = 400  # Longer paragraphs are cut into windows of this size
+MIN_CHUNK_WORDS = 20  # Shorter chunks are folded into the previous one, or dropped
+SHARD_BYTES = 1_000_000
+SHINGLE_WORDS = 5
+NUM_PERM = 128  # MinHash signature length; must be a power of two
+LSH_BANDS = 32  # 32 bands of 4 rows: pairs at ~0.8 similarity collide almost surely
+NEAR_DUP_THRESHOLD = 0.8
+
+# Lines the scraper picked up from every page's chrome
+BOILERPLATE_LINES = frozenset([
+    'White House Press',
+    'Warroom News',
+    'Source: War Room',
+    'Follow @NatalieGWinters on all platforms & buy her a coffee.',
+    'Natalie G Winters is a rising star in journalism and a White House press correspondent '
+    'known for her insightful analysis on media, politics, culture and business.',
+])
+BOILERPLATE_RE = re.compile(r'^(© \d{4} WarRoom|Published on: .*)$')
+WORD_RE = re.compile(r'\w+')
+
+ROWS_PER_BAND = NUM_PERM // LSH_BANDS
+BIN_BITS = NUM_PERM.bit_length() - 1
+EMPTY_BIN = (1 << 64) - 1
+
+
+def is_boilerplate(line):
+    return line in BOILERPLATE_LINES or bool(BOILERPLATE_RE.match(line))
+
+
+def normalize(text):
+    return ' '.join(WORD_RE.findall(text.lower()))
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize(text).encode('utf-8')).hexdigest()[:32]
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Documents -----------------------------------------------------------------
+
+def iter_natbot_documents(paths):
+    """Yield (source, paragraphs) for every blank-line separated block across all `paths`"""
+    paragraphs = []
+    source = None
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    if paragraphs:
+                        yield source, paragraphs
+                        paragraphs = []
+                    continue
+                if is_boilerplate(line):
+                    continue
+                if not paragraphs:
+                    source = f'natbot/{os.path.basename(path)}'
+                paragraphs.append(line)
+    if paragraphs:
+        yield source, paragraphs
+
+
+def article_paragraphs(article):
+    text = html_to_text(article.get('content'))
+    return [line.strip() for line in text.split('\n') if line.strip() and not is_boilerplate(line.strip())]
+
+
+# Chunking ------------------------------------------------------------------
+
+def split_paragraphs(paragraphs):
+    """Group paragraphs into chunks of about CHUNK_WORDS words; returns a list of texts"""
+    chunks = []
+    current, words = [], 0
+
+    def flush():
+        nonlocal current, words
+        if current:
+            chunks.append('\n\n'.join(current))
+        current, words = [], 0
+
+    for paragraph in paragraphs:
+        tokens = paragraph.split()
+        if len(tokens) > MAX_CHUNK_WORDS:
+            flush()
+            for start in range(0, len(tokens), MAX_CHUNK_WORDS):
+                chunks.append(' '.join(tokens[start:start + MAX_CHUNK_WORDS]))
+            continue
+        if words and words + len(tokens) > MAX_CHUNK_WORDS:
+            flush()
+        current.append(paragraph)
+        words += len(tokens)
+        if words >= CHUNK_WORDS:
+            flush()
+    flush()
+
+    # A short tail reads better as part of the chunk before it
+    if len(chunks) > 1 and len(chunks[-1].split()) < MIN_CHUNK_WORDS:
+        tail = chunks.pop()
+        chunks[-1] += '\n\n' + tail
+    return [chunk for chunk in chunks if len(chunk.split()) >= MIN_CHUNK_WORDS]
+
+
+def make_chunks(source, title, paragraphs):
+    """Chunk records for one document; IDs derive from the source and the text, so they are stable"""
+    texts = split_paragraphs(paragraphs)
+    doc_id = hashlib.sha256(('\n'.join([source] + paragraphs)).encode('utf-8')).hexdigest()[:16]
+    return [{
+        'id': f'{doc_id}-{seq}',
+        'doc_id': doc_id,
+        'seq': seq,
+        'chunks': len(texts),
+        'source': source,
+        'title': title,
+        'words': len(text.split()),
+        'text': text
+    } for seq, text in enumerate(texts)]
+
+
+# MinHash / LSH ---------------------------------------------------------------
+
+def minhash(text):
+    """One-permutation MinHash: one 64-bit hash per shingle, minimum kept per bin.
+
+    Empty bins borrow the value of the next non-empty bin (rotation
+    densification), so the signature stays comparable position by position.
+    """
+    words = WORD_RE.findall(text.lower())
+    span = min(SHINGLE_WORDS, len(words))
+    signature = [EMPTY_BIN] * NUM_PERM
+    for start in range(max(1, len(words) - span + 1)):
+        shingle = ' '.join(words[start:start + span]).encode('utf-8')
+        value = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'little')
+        bin_index = value & (NUM_PERM - 1)
+        value >>= BIN_BITS
+        if value < signature[bin_index]:
+            signature[bin_index] = value
+    if all(value == EMPTY_BIN for value in signature):
+        return signature
+    original = list(signature)
+    for index in range(NUM_PERM):
+        offset = 1
+        while signature[index] == EMPTY_BIN:
+            borrowed = original[(index + offset) % NUM_PERM]
+            if borrowed != EMPTY_BIN:
+                signature[index] = borrowed + offset  # Keep borrowed bins distinct
+            offset += 1
+    return signature
+
+
+def similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+class Deduplicator:
+    """Exact hashes plus LSH buckets over MinHash signatures of everything kept so far"""
+
+    def __init__(self):
+        self.hashes = set()
+        self.order = []  # Hash of the n-th kept chunk
+        self.signatures = []  # Signature of the n-th kept chunk
+        self.numbers = {}  # Hash -> n
+        self.forgotten = set()  # n of chunks removed since; skipped, and dropped on save
+        self.buckets = [{} for _ in range(LSH_BANDS)]
+        self.exact_dupes = 0
+        self.near_dupes = 0
+
+    def _bands(self, signature):
+        for band in range(LSH_BANDS):
+            yield band, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+
+    def _remember(self, digest, signature):
+        number = len(self.signatures)
+        self.hashes.add(digest)
+        self.numbers[digest] = number
+        self.order.append(digest)
+        self.signatures.append(signature)
+        for band, key in self._bands(signature):
+            self.buckets[band].setdefault(key, []).append(number)
+
+    def check(self, text):
+        """Return True (and remember the text) if it is neither an exact nor a near duplicate"""
+        digest = text_hash(text)
+        if digest in self.hashes:
+            self.exact_dupes += 1
+            return False
+        signature = minhash(text)
+        checked = set()
+        for band, key in self._bands(signature):
+            for number in self.buckets[band].get(key, ()):
+                if number not in checked and number not in self.forgotten:
+                    checked.add(number)
+                    if similarity(signature, self.signatures[number]) >= NEAR_DUP_THRESHOLD:
+                        self.near_dupes += 1
+                        return False
+        self._remember(digest, signature)
+        return True
+
+    def forget(self, text):
+        """Stop treating a kept chunk's text as seen, once the chunk is gone from the shards"""
+        digest = text_hash(text)
+        number = self.numbers.pop(digest, None)
+        if number is not None:
+            self.hashes.discard(digest)
+            self.forgotten.add(number)
+
+    def save(self, directory):
+        live = [number for number in range(len(self.order)) if number not in self.forgotten]
+        with atomic_open(os.path.join(directory, 'signatures.bin'), 'wb') as f:
+            for number in live:
+                array('Q', self.signatures[number]).tofile(f)
+        write_json_atomic(os.path.join(directory, 'hashes.json'), [self.order[number] for number in live])
+
+    def load(self, directory):
+        """Restore what save() wrote, if anything"""
+        try:
+            with open(os.path.join(directory, 'hashes.json'), 'r', encoding='utf-8') as f:
+                order = json.load(f)
+        except FileNotFoundError:
+            return
+        signatures = array('Q')
+        with open(os.path.join(directory, 'signatures.bin'), 'rb') as f:
+            signatures.frombytes(f.read())
+        for number, digest in enumerate(order):
+            self._remember(digest, list(signatures[number * NUM_PERM:(number + 1) * NUM_PERM]))
+
+
+# Shards --------------------------------------------------------------------
+
+class ShardWriter:
+    """Append chunks to JSONL shards of about SHARD_BYTES, reopening the last shard if it has room"""
+
+    def __init__(self, directory, shards):
+        self.directory = directory
+        self.shards = shards  # Manifest entries, updated in place
+        self.lines = []
+        self.size = 0
+        self.entry = None
+        if shards and shards[-1]['bytes'] < SHARD_BYTES:
+            self.entry = shards[-1]
+            with open(os.path.join(directory, self.entry['name']), 'r', encoding='utf-8') as f:
+                self.lines = f.readlines()
+            self.size = self.entry['bytes']
+        self.dirty = False
+
+    def add(self, chunk):
+        if self.entry is None or self.size >= SHARD_BYTES:
+            self.flush()
+            self.entry = {'name': f'shard-{len(self.shards) + 1:05d}.jsonl', 'chunks': 0, 'words': 0, 'bytes': 0}
+            self.shards.append(self.entry)
+            self.lines, self.size = [], 0
+        line = json.dumps(chunk, ensure_ascii=False) + '\n'
+        self.lines.append(line)
+        self.size += len(line.encode('utf-8'))
+        self.entry['chunks'] += 1
+        self.entry['words'] += chunk['words']
+        self.dirty = True
+
+    def _write(self, entry, lines):
+        data = ''.join(lines).encode('utf-8')
+        with atomic_open(os.path.join(self.directory, entry['name']), 'wb') as f:
+            f.write(data)
+        entry['bytes'] = len(data)
+        entry['sha256'] = hashlib.sha256(data).hexdigest()
+
+    def flush(self):
+        if not self.dirty:
+            return
+        self._write(self.entry, self.lines)
+        self.dirty = False
+
+    def remove(self, sources):
+        """Drop every chunk of the documents in `sources` from the shards; returns the chunks dropped"""
+        removed = []
+        for entry in self.shards:
+            if entry is self.entry:
+                lines = self.lines
+            else:
+                with open(os.path.join(self.directory, entry['name']), 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+            kept = []
+            for line in lines:
+                chunk = json.loads(line)
+                if chunk['source'] in sources:
+                    removed.append(chunk)
+                    entry['chunks'] -= 1
+                    entry['words'] -= chunk['words']
+                else:
+                    kept.append(line)
+            if len(kept) == len(lines):
+                continue
+            if entry is self.entry:
+                self.lines = kept
+                self.size = sum(len(line.encode('utf-8')) for line in kept)
+                self.dirty = True
+            else:
+                self._write(entry, kept)
+        return removed
+
+
+# Build ---------------------------------------------------------------------
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def build_corpus(articles_file=SITE_ARTICLES_FILE, natbot_dir=NATBOT_DIR, out_dir=NATBOT_CORPUS_DIR, rebuild=False):
+    if rebuild and os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            os.remove(os.path.join(out_dir, name))
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _load_json(os.path.join(out_dir, 'manifest.json'), {
+        'updated': None,
+        'shards': [],
+        'totals': {'documents': 0, 'input_words': 0, 'chunks': 0, 'words': 0, 'exact_dupes': 0, 'near_dupes': 0}
+    })
+    # Which inputs have been read: article URL -> text hash, NatBot file -> SHA-256
+    state = _load_json(os.path.join(out_dir, 'state.json'), {'articles': {}, 'natbot_files': {}})
+    dedup = Deduplicator()
+    dedup.load(out_dir)
+    writer = ShardWriter(out_dir, manifest['shards'])
+    totals = manifest['totals']
+    before = dict(totals)
+
+    def consume(chunks):
+        totals['documents'] += 1
+        for chunk in chunks:
+            totals['input_words'] += chunk['words']
+            with metrics.stage('dedup'):
+                kept = dedup.check(chunk['text'])
+            if kept:
+                writer.add(chunk)
+                totals['chunks'] += 1
+                totals['words'] += chunk['words']
+
+    removed = []
+    if articles_file and os.path.exists(articles_file):
+        edited = []  # Chunked once the old version is out of the shards
+        for article in iter_articles(articles_file):
+            url = article.get('sourceUrl')
+            paragraphs = article_paragraphs(article)
+            digest = text_hash('\n'.join(paragraphs))
+            if not url or state['articles'].get(url) == digest:
+                continue
+            if url in state['articles']:
+                edited.append((url, article.get('title'), paragraphs))
+            else:
+                consume(make_chunks(url, article.get('title'), paragraphs))
+            state['articles'][url] = digest
+        if edited:
+            with metrics.stage('shard_write'):
+                removed = writer.remove({url for url, _, _ in edited})
+            for chunk in removed:
+                dedup.forget(chunk['text'])
+                totals['chunks'] -= 1
+                totals['words'] -= chunk['words']
+            for url, title, paragraphs in edited:
+                consume(make_chunks(url, title, paragraphs))
+
+    paths = sorted(glob.glob(os.path.join(natbot_dir, '*.txt'))) if natbot_dir else []
+    fingerprints = {os.path.basename(path): file_fingerprint(path) for path in paths}
+    if state['natbot_files'] != fingerprints:
+        # The parts are one stream and a document can run from one into the
+        # next, so any change replaces every NatBot chunk
+        sources = {f'natbot/{name}' for name in set(state['natbot_files']) | set(fingerprints)}
+        with metrics.stage('shard_write'):
+            stale = writer.remove(sources)
+        for chunk in stale:
+            dedup.forget(chunk['text'])
+            totals['chunks'] -= 1
+            totals['words'] -= chunk['words']
+        removed += stale
+        for source, paragraphs in iter_natbot_documents(paths):
+            consume(make_chunks(source, None, paragraphs))
+        state['natbot_files'] = fingerprints
+
+    totals['exact_dupes'] += dedup.exact_dupes
+    totals['near_dupes'] += dedup.near_dupes
+    with metrics.stage('shard_write'):
+        writer.flush()
+    metrics.inc('chunks_total', totals['chunks'] - before['chunks'] + len(removed), result='kept')
+    metrics.inc('chunks_total', dedup.exact_dupes, result='exact_duplicate')
+    metrics.inc('chunks_total', dedup.near_dupes, result='near_duplicate')
+    metrics.inc('chunks_total', len(removed), result='removed')
+    if totals != before or removed:
+        dedup.save(out_dir)
+        write_json_atomic(os.path.join(out_dir, 'state.json'), state, indent=1)
+        manifest['updated'] = datetime.utcnow().isoformat()
+        write_json_atomic(os.path.join(out_dir, 'manifest.json'), manifest, indent=1)
+
+    kept = totals['words'] / totals['input_words'] if totals['input_words'] else 0
+    print(f"Corpus {out_dir}: {totals['chunks']} chunks, {totals['words']} words in {len(manifest['shards'])} shards "
+          f"({kept:.0%} of {totals['input_words']} input words)")
+    print(f"This run: {totals['documents'] - before['documents']} new or changed documents, "
+          f"{totals['chunks'] - before['chunks'] + len(removed)} chunks kept, {len(removed)} stale chunks removed, "
+          f"{dedup.exact_dupes} exact and {dedup.near_dupes} near duplicates dropped")
+    return manifest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build the deduplicated NatBot training corpus')
+    parser.add_argument('--articles', default=SITE_ARTICLES_FILE, help='article corpus (JSON array or JSONL)')
+    parser.add_argument('--natbot', default=NATBOT_DIR, help='directory of NatBot .txt files')
+    parser.add_argument('--out', default=NATBOT_CORPUS_DIR, help='output directory')
+    parser.add_argument('--rebuild', action='store_true', help='discard the existing corpus and start over')
+    profiling.add_argument(parser)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    try:
+        build_corpus(args.articles, args.natbot, args.out, args.rebuild)
+    finally:
+        metrics.write_run_summary('natbot_corpus')
@@ -1,8 +1,12 @@
+import argparse
 import os
 import json
 from bs4 import BeautifulSoup
 from datetime import datetime
 import re
+from article_corpus import JsonArrayWriter
+import metrics
+import profiling
 
 def clean_filename(filename):
     # Remove file extension
@@ -57,7 +61,8 @@ def main():
         if filename.endswith('.html'):
             file_path = os.path.join(folder_path, filename)
             try:
-                article = extract_article_info(file_path)
+                with metrics.stage('extract'):
+                    article = extract_article_info(file_path)
                 articles.append(article)
                 print(f'Processed: {filename}')
             except Exception as e:
@@ -68,11 +73,24 @@ def main():
     
     # Write to JSON file
     output_path = 'public/warroom-articles.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(articles, f, indent=2, ensure_ascii=False)
+    with metrics.stage('json_write'), JsonArrayWriter(output_path) as writer:
+        for article in articles:
+            writer.write(article)
     
+    metrics.inc('articles_total', len(articles))
     print(f'\nProcessed {len(articles)} articles')
     print(f'JSON file created at: {output_path}')
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Rebuild the article JSON from the old War Room article pages')
+    profiling.add_argument(parser)
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    try:
+        main()
+    finally:
+        metrics.write_run_summary('process_articles') 
\ No newline at end of file
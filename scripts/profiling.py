@@ -0,0 +1,188 @@
+"""--profile mode for the scripts: per-stage cProfile, tracemalloc and collapsed stacks.
+
+Once start() has been called, every metrics.stage() (and every section()
+below) also feeds the profilers, and metrics.write_run_summary() writes
+
+    profiles/<job>.<stage>.pstats   cProfile of each stage; <job>.run.pstats is time outside any stage
+    profiles/<job>.collapsed        sampled stacks prefixed with the running stage, one
+                                    "frame;frame;... count" line each, for flamegraph.pl or speedscope
+    profiles/<job>.memory.json      per stage: net bytes allocated, and the lines that allocated
+                                    most during its first SNAPSHOTS_PER_STAGE passes (tracemalloc)
+
+Stage profilers are kept as a stack per thread: entering a stage pauses the
+profiler underneath it and leaving it resumes that one, so CPU-bound
+stages that never await (sanitize, page_render, checkpoint_save,
+sitemap_write) are measured exactly. Stages that await (navigate, listing,
+http_fetch) also collect whatever other tasks ran while they waited; their
+wall time is better read from the metrics summary.
+
+Profiling slows a run down noticeably; use it to find hot spots, not to time them.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILES_DIR = 'profiles'
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+SNAPSHOTS_PER_STAGE = 3  # Passes per stage compared with full tracemalloc snapshots
+TOP_ALLOCATIONS = 15
+TRACE_FRAMES = 1
+
+ACTIVE = False
+_profiles = {}  # stage -> cProfile.Profile
+_stacks = {}  # thread id -> [[stage, profiler, memory at entry, snapshot or None], ...]
+_memory = {}  # stage -> {'passes', 'net_bytes', 'top': Counter}
+_samples = Counter()
+_sampler = None
+_stop = threading.Event()
+
+
+def _profiler(stage):
+    if stage not in _profiles:
+        _profiles[stage] = cProfile.Profile()
+    return _profiles[stage]
+
+
+def _snapshot():
+    # Leave out the profiler's own bookkeeping
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+
+def start():
+    """Turn profiling on for the rest of the run"""
+    global ACTIVE, _sampler
+    if ACTIVE:
+        return
+    ACTIVE = True
+    tracemalloc.start(TRACE_FRAMES)
+    base = _profiler('run')
+    _stacks[threading.get_ident()] = [['run', base, 0, None]]
+    base.enable()
+    _sampler = threading.Thread(target=_sample_loop, daemon=True)
+    _sampler.start()
+    print(f'Profiling enabled, results go to {PROFILES_DIR}/')
+
+
+def enter(stage):
+    """Called when a stage starts; returns a token for leave()"""
+    stack = _stacks.setdefault(threading.get_ident(), [])
+    if stack:
+        stack[-1][1].disable()
+    memory = _memory.setdefault(stage, {'passes': 0, 'net_bytes': 0, 'top': Counter()})
+    snapshot = _snapshot() if memory['passes'] < SNAPSHOTS_PER_STAGE else None
+    memory['passes'] += 1
+    entry = [stage, _profiler(stage), tracemalloc.get_traced_memory()[0], snapshot]
+    stack.append(entry)
+    entry[1].enable()
+    return entry
+
+
+def leave(entry):
+    """Called when a stage ends, with the token enter() returned"""
+    stack = _stacks.get(threading.get_ident(), [])
+    on_top = bool(stack) and stack[-1] is entry
+    if on_top:
+        entry[1].disable()
+    stage, _, memory_before, snapshot = entry
+    memory = _memory[stage]
+    memory['net_bytes'] += tracemalloc.get_traced_memory()[0] - memory_before
+    if snapshot is not None:
+        for stat in _snapshot().compare_to(snapshot, 'lineno')[:TOP_ALLOCATIONS]:
+            if stat.size_diff > 0:
+                frame = stat.traceback[0]
+                memory['top'][f'{frame.filename}:{frame.lineno}'] += stat.size_diff
+    # Async stages can finish out of order; only the top profiler is ever running
+    if entry in stack:
+        stack.remove(entry)
+    if on_top and stack:
+        stack[-1][1].enable()
+
+
+@contextmanager
+def section(stage):
+    """Profile a block as `stage` without recording metrics (no-op unless profiling)"""
+    if not ACTIVE:
+        yield
+        return
+    entry = enter(stage)
+    try:
+        yield
+    finally:
+        leave(entry)
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def _sample_loop():
+    me = threading.get_ident()
+    while not _stop.wait(SAMPLE_INTERVAL):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = _stacks.get(thread_id)
+            stage = stack[-1][0] if stack else 'run'
+            _samples[';'.join([stage] + frames[::-1])] += 1
+
+
+def write(job, directory=PROFILES_DIR):
+    """Stop profiling and write the stats; no-op unless start() was called"""
+    global ACTIVE
+    if not ACTIVE:
+        return
+    ACTIVE = False
+    _stop.set()
+    _sampler.join()
+    for stack in _stacks.values():
+        for _, profiler, _, _ in stack:
+            profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+
+    totals = {}
+    for stage, profiler in _profiles.items():
+        path = os.path.join(directory, f'{job}.{stage}.pstats')
+        profiler.dump_stats(path)
+        totals[stage] = sum(row.inlinetime for row in profiler.getstats())
+
+    with open(os.path.join(directory, f'{job}.collapsed'), 'w', encoding='utf-8') as f:
+        for stack, count in sorted(_samples.items()):
+            f.write(f'{stack} {count}\n')
+
+    memory = {
+        stage: {
+            'passes': info['passes'],
+            'net_bytes': info['net_bytes'],
+            'top_allocations': [{'line': line, 'bytes': size} for line, size in info['top'].most_common(TOP_ALLOCATIONS)]
+        }
+        for stage, info in _memory.items()
+    }
+    memory['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    with open(os.path.join(directory, f'{job}.memory.json'), 'w', encoding='utf-8') as f:
+        json.dump(memory, f, indent=2)
+
+    print(f'Profiles written to {directory}/{job}.*.pstats, {job}.collapsed and {job}.memory.json')
+    for stage, seconds in sorted(totals.items(), key=lambda item: -item[1])[:8]:
+        top = memory.get(stage, {}).get('top_allocations') or [{}]
+        print(f'  {stage}: {seconds:.2f}s profiled CPU'
+              + (f", most allocated at {top[0]['line']}" if top[0] else ''))
+    print(f'  Peak traced Python memory: {memory["peak_traced_bytes"] / 2**20:.1f} MB')
+    print(f'  Flamegraph: flamegraph.pl {directory}/{job}.collapsed > {job}.svg')
+
+
+def add_argument(parser):
+    parser.add_argument('--profile', action='store_true',
+                        help=f'profile each stage with cProfile and tracemalloc, writing to {PROFILES_DIR}/')
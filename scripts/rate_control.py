@@ -0,0 +1,212 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import metrics
+
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+LATENCY_TARGET = 10.0  # seconds; slower successes stop the limiter from growing
+BACKOFF_FACTOR = 0.5  # Multiplicative decrease on overload
+HOST_RATE = 10.0  # requests per second per host
+HOST_BURST = 20
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 60.0
+OVERLOAD_STATUS = frozenset([429, 500, 502, 503, 504])
+
+
+class OverloadedError(Exception):
+    """The origin answered with 429 or a 5xx; raised for responses that don't raise by themselves"""
+
+    def __init__(self, url, status, retry_after=None):
+        super().__init__(f'HTTP {status} for {url}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response(url, response):
+    """Raise OverloadedError for a Playwright response with an overload status"""
+    if response is not None and response.status in OVERLOAD_STATUS:
+        raise OverloadedError(url, response.status, parse_retry_after(response.headers.get('retry-after')))
+
+
+def classify(exc):
+    """Return 'overload' (back off and retry), 'retry' (retry only) or None (give up)"""
+    if isinstance(exc, OverloadedError):
+        return 'overload'
+    if isinstance(exc, httpx.HTTPStatusError):
+        return 'overload' if exc.response.status_code in OVERLOAD_STATUS else None
+    if isinstance(exc, (httpx.TimeoutException, PlaywrightTimeoutError, asyncio.TimeoutError)):
+        return 'overload'
+    if isinstance(exc, (httpx.TransportError, PlaywrightError)):
+        return 'retry'  # Dropped connections, net::ERR_*, crashed tabs
+    return None
+
+
+def retry_after(exc):
+    if isinstance(exc, OverloadedError):
+        return exc.retry_after
+    if isinstance(exc, httpx.HTTPStatusError):
+        return parse_retry_after(exc.response.headers.get('retry-after'))
+    return None
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY, hint=None):
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if hint is not None:
+        delay = max(delay, min(hint, cap))
+    return delay
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit.
+
+    Every healthy, fast completion adds 1/limit, so the limit grows by about
+    one per round of requests; a timeout, 429 or 5xx halves it. Decreases are
+    spaced at least one latency apart so a burst of failures from the same
+    round only counts once.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, min_limit=MIN_CONCURRENCY, max_limit=None,
+                 latency_target=LATENCY_TARGET, backoff=BACKOFF_FACTOR):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit or initial
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, overloaded=False):
+        async with self._changed:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease > latency:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif latency <= self.latency_target:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.peak_limit = max(self.peak_limit, self.limit)
+            self._changed.notify_all()
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waits = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                self.waits += 1
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateController:
+    """Runs requests under the adaptive limit and per-host buckets, retrying transient failures"""
+
+    def __init__(self, limiter, host_rate=HOST_RATE, host_burst=HOST_BURST,
+                 max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.limiter = limiter
+        self.buckets = defaultdict(lambda: TokenBucket(host_rate, host_burst))
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.overloads = 0
+
+    async def call(self, url, fn, *args):
+        """Return `await fn(*args)`, retrying with jittered backoff while the failure is transient"""
+        host = urlsplit(url).hostname
+        for attempt in range(self.max_attempts):
+            await self.buckets[host].acquire()
+            await self.limiter.acquire()
+            start = time.monotonic()
+            kind = None
+            try:
+                return await fn(*args)
+            except Exception as exc:
+                kind = classify(exc)
+                if kind is None or attempt == self.max_attempts - 1:
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay, retry_after(exc))
+                error = exc
+            finally:
+                if kind == 'overload':
+                    self.overloads += 1
+                    metrics.inc('overloads_total', host=host)
+                await self.limiter.release(time.monotonic() - start, overloaded=kind == 'overload')
+                metrics.set_gauge('concurrency_limit', round(self.limiter.limit, 2))
+            self.retries += 1
+            metrics.inc('retries_total', host=host)
+            print(f'Retrying {url} in {delay:.1f}s (attempt {attempt + 2}/{self.max_attempts}): {error}')
+            await asyncio.sleep(delay)
+
+    def get_stats(self):
+        return {
+            'limit': round(self.limiter.limit, 1),
+            'peak_limit': round(self.limiter.peak_limit, 1),
+            'backoffs': self.limiter.decreases,
+            'retries': self.retries,
+            'overloads': self.overloads,
+            'throttled': sum(bucket.waits for bucket in self.buckets.values())
+        }
+
+
+def call_with_retries(fn, *args, max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Blocking version of RateController.call's retry loop for the sync scrapers"""
+    for attempt in range(max_attempts):
+        try:
+            return fn(*args)
+        except Exception as exc:
+            if classify(exc) is None or attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay, retry_after(exc))
+            metrics.inc('retries_total')
+            print(f'Retrying in {delay:.1f}s (attempt {attempt + 2}/{max_attempts}): {exc}')
+            time.sleep(delay)
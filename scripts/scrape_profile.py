@@ -0,0 +1,160 @@
+# Lightweight rendering profile shared by every Playwright scraper.
+#
+# We only ever read the DOM, so images, video, fonts and ad/analytics
+# scripts are aborted before they are requested, and pages are considered
+# loaded once the HTML is parsed and the element we need exists, instead
+# of waiting for the network to go idle.
+from urllib.parse import urlsplit
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import metrics
+
+NAVIGATION_TIMEOUT = 30000
+SELECTOR_TIMEOUT = 10000
+
+BLOCKED_RESOURCE_TYPES = frozenset(['image', 'media', 'font', 'ping'])
+TRACKER_DOMAINS = (
+    'google-analytics.com', 'googletagmanager.com', 'googlesyndication.com',
+    'googleadservices.com', 'doubleclick.net', 'adservice.google.com',
+    'facebook.net', 'connect.facebook.com', 'scorecardresearch.com',
+    'quantserve.com', 'amazon-adsystem.com', 'adnxs.com', 'criteo.com',
+    'pubmatic.com', 'rubiconproject.com', 'taboola.com', 'outbrain.com',
+    'hotjar.com', 'chartbeat.com', 'moatads.com', 'newrelic.com',
+    'nr-data.net', 'cloudflareinsights.com', 'onesignal.com', 'sharethis.com',
+    'addthis.com', 'revcontent.com', 'mgid.com', 'ezoic.net',
+)
+
+# Aborted requests never report a size, so what blocking saves can only be
+# guessed from typical transfer sizes on the sites we scrape. These figures
+# are not measured; everything derived from them is reported as an estimate.
+ESTIMATED_BYTES = {
+    'image': 60_000,
+    'media': 500_000,
+    'font': 35_000,
+    'script': 40_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+# Layout-only settings; no screenshots are taken so a big viewport buys nothing
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1280, 'height': 720},
+    'java_script_enabled': True,
+    'service_workers': 'block',  # Requests made by a service worker would bypass routing
+}
+
+
+def is_tracker(url):
+    host = urlsplit(url).hostname or ''
+    return any(host == domain or host.endswith('.' + domain) for domain in TRACKER_DOMAINS)
+
+
+def block_reason(request):
+    """Return why `request` should be aborted, or None to let it through"""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return request.resource_type
+    if is_tracker(request.url):
+        return 'tracker'
+    return None
+
+
+class TrafficStats:
+    """Requests the profile blocked, in total and since the last page report.
+
+    A stats object can feed a parent so each tab reports its own pages while
+    the pool keeps the crawl-wide totals.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.pages = 0
+        self.blocked = 0
+        self.estimated_bytes_saved = 0
+        self._page_blocked = 0
+        self._page_bytes = 0
+
+    def record(self, request, reason):
+        saved = ESTIMATED_BYTES.get(request.resource_type, DEFAULT_ESTIMATED_BYTES)
+        self._page_blocked += 1
+        self._page_bytes += saved
+        metrics.inc('blocked_requests_total', reason=reason)
+        stats = self
+        while stats:
+            stats.blocked += 1
+            stats.estimated_bytes_saved += saved
+            stats = stats.parent
+
+    def end_page(self, label):
+        """Print what was blocked while loading the page just finished"""
+        if self._page_blocked:
+            print(f'Blocked {self._page_blocked} requests on {label} (est. ~{self._page_bytes // 1024} KB saved)')
+        self._page_blocked = 0
+        self._page_bytes = 0
+        stats = self
+        while stats:
+            stats.pages += 1
+            stats = stats.parent
+
+    def get_stats(self):
+        return {
+            'pages': self.pages,
+            'blocked_requests': self.blocked,
+            'est_kb_saved': self.estimated_bytes_saved // 1024,
+            'est_kb_saved_per_page': self.estimated_bytes_saved // 1024 // max(self.pages, 1)
+        }
+
+
+def apply_profile(target, stats):
+    """Install request blocking on a sync Playwright page or context"""
+    def handle(route):
+        reason = block_reason(route.request)
+        if reason:
+            stats.record(route.request, reason)
+            route.abort()
+        else:
+            route.continue_()
+    target.route('**/*', handle)
+
+
+async def apply_profile_async(target, stats):
+    """Install request blocking on an async Playwright page or context"""
+    async def handle(route):
+        reason = block_reason(route.request)
+        if reason:
+            stats.record(route.request, reason)
+            await route.abort()
+        else:
+            await route.continue_()
+    await target.route('**/*', handle)
+
+
+def load_page(page, url, wait_for=None, timeout=NAVIGATION_TIMEOUT, selector_timeout=SELECTOR_TIMEOUT):
+    """Navigate until the DOM is parsed and `wait_for` matches, and return the response.
+
+    A selector that never appears is not an error here; callers look for the
+    elements they need afterwards and decide what a missing one means.
+    """
+    host = metrics.host_of(url)
+    with metrics.stage('navigate', host):
+        response = page.goto(url, wait_until='domcontentloaded', timeout=timeout)
+    if wait_for:
+        with metrics.stage('selector_wait', host):
+            try:
+                page.wait_for_selector(wait_for, timeout=selector_timeout)
+            except PlaywrightTimeoutError:
+                metrics.inc('selector_timeouts_total', host=host)
+    return response
+
+
+async def load_page_async(page, url, wait_for=None, timeout=NAVIGATION_TIMEOUT, selector_timeout=SELECTOR_TIMEOUT):
+    """Async version of load_page"""
+    host = metrics.host_of(url)
+    with metrics.stage('navigate', host):
+        response = await page.goto(url, wait_until='domcontentloaded', timeout=timeout)
+    if wait_for:
+        with metrics.stage('selector_wait', host):
+            try:
+                await page.wait_for_selector(wait_for, timeout=selector_timeout)
+            except PlaywrightTimeoutError:
+                metrics.inc('selector_timeouts_total', host=host)
+    return response
@@ -1,31 +1,68 @@
+import argparse
 import asyncio
 from playwright.async_api import async_playwright
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import os
 import time
-from bs4 import BeautifulSoup
-import psutil
-import signal
 import sys
 import traceback
-from asyncio import Semaphore
+from browser_pool import BrowserPool
+from memory_watchdog import MEMORY_BUDGET_MB, MemoryWatchdog
+import memory_watchdog
+from article_fetcher import BrowserFetcher, FallbackFetcher, HttpFetcher
+from crawl_state import CrawlState
+from article_checkpoint import ArticleCheckpoint
+from article_corpus import JsonArrayWriter, iter_articles
+from page_template import write_article_page
+from html_sanitizer import sanitize_html
+from listing_extract import WARROOM_PREVIEWS, extract_items_async
+from scrape_profile import load_page_async
+from rate_control import AdaptiveLimiter, RateController, check_response
+from wp_api import WordPressAPI, post_to_preview
+import metrics
+import profiling
 
-# Maximum concurrent article processing
-MAX_CONCURRENT = 3  # Reduced for more stability
+# Ceiling for concurrent article processing (tabs in the shared browser pool);
+# the adaptive limiter decides how many actually run at once
+MAX_CONCURRENT = 20
+LISTING_PREFETCH = 2  # Listing pages scraped ahead of the article workers
+URL_QUEUE_SIZE = MAX_CONCURRENT * 2  # Bounds how far the listing pages run ahead
+SAVE_EVERY = 20  # Commit the crawl state after this many finished articles
 PAGE_LOAD_TIMEOUT = 60000  # Increased timeout to 60 seconds
 NAVIGATION_TIMEOUT = 90000  # Added separate navigation timeout
-
-def init_worker():
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
+ARTICLES_FILE = 'public/warroom-articles.json'
+LISTING_URL = 'https://warroom.org/category/newsroom/'
+POSTS_API_URL = 'https://warroom.org/wp-json/wp/v2/posts'
+# Re-read posts modified this long before the last sync; the API compares in
+# the site's timezone and unchanged articles are skipped anyway
+API_SYNC_OVERLAP = timedelta(days=1)
+SANITIZER_PARSER = 'lxml'  # Falls back to html.parser when lxml isn't installed
+END_OF_LISTING = '.jeg_404_content, .jeg_empty_content'
 
 class SharedState:
     def __init__(self):
-        self.articles = []
+        self.articles = []  # Articles found by this run, newest first
         self.articles_processed = 0
         self.current_page = 0
-        self.semaphore = Semaphore(MAX_CONCURRENT)
+        self.pending = {}  # listing page -> articles still being processed
+        self.completed_page = 0
+
+    def add_page(self, page_num, count):
+        self.pending[page_num] = count
+        return self._advance_completed()
+
+    def article_done(self, page_num):
+        self.pending[page_num] -= 1
+        return self._advance_completed()
+
+    def _advance_completed(self):
+        # Highest listing page such that it and every page before it are finished
+        while self.pending.get(self.completed_page + 1) == 0:
+            self.completed_page += 1
+            del self.pending[self.completed_page]
+        return self.completed_page
 
     def increment_processed(self):
         self.articles_processed += 1
@@ -42,26 +79,33 @@ class SharedState:
             'processed': self.articles_processed
         }
 
-def save_progress(articles, force=False):
+def iter_existing_articles():
+    """Stream the archive; a read error is raised, never treated as the end of the file"""
+    if not os.path.exists(ARTICLES_FILE):
+        return
     try:
-        print(f'\nSaving progress... ({len(articles)} articles)')
-        os.makedirs('public', exist_ok=True)
-        
-        # Save to new file to preserve existing data
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'public/warroom-articles_{timestamp}.json'
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(articles, f, indent=2, ensure_ascii=False)
-        print(f'Progress saved to {filename}')
-        
-        # Also update the main file
-        with open('public/warroom-articles.json', 'w', encoding='utf-8') as f:
-            json.dump(articles, f, indent=2, ensure_ascii=False)
-            
+        yield from iter_articles(ARTICLES_FILE)
     except Exception as e:
-        print(f'Error saving progress: {str(e)}')
-        traceback.print_exc()
+        print(f'Error loading {ARTICLES_FILE}: {str(e)}')
+        raise
+
+def compact_articles(new_articles):
+    """Rebuild the main articles file from this run's articles followed by the archive.
+
+    Raises if the archive can't be read or the new file can't be written;
+    the old file is left in place either way.
+    """
+    print(f'\nCompacting articles... ({len(new_articles)} new articles)')
+    new_urls = {article['sourceUrl'] for article in new_articles}
+    # Streams the old file into a temp file + rename, so memory stays flat
+    # and a failure can never leave a truncated main file
+    with JsonArrayWriter(ARTICLES_FILE) as writer:
+        for article in new_articles:
+            writer.write(article)
+        for article in iter_existing_articles():
+            if article['sourceUrl'] not in new_urls:
+                writer.write(article)
+    print(f'Articles saved to {ARTICLES_FILE} ({writer.count} total)')
 
 def clean_filename(title):
     filename = re.sub(r'[^\w\s-]', '', title.lower())
@@ -73,7 +117,7 @@ def format_date(date_str):
         cleaned_date = re.sub(r'\s*\bi class="fa fa-clock-o"\i\s*', '', date_str)
         date_obj = datetime.strptime(cleaned_date.strip(), '%B %d, %Y')
         return date_obj.strftime('%Y-%m-%d')
-    except:
+    except (TypeError, ValueError):
         return datetime.now().strftime('%Y-%m-%d')
 
 def clean_html_content(html_content):
@@ -81,238 +125,304 @@ def clean_html_content(html_content):
         return ''
     
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        for element in soup(['script', 'style', 'iframe']):
-            element.decompose()
-        
-        for tag in soup.find_all(True):
-            tag.attrs = {key: value for key, value in tag.attrs.items() 
-                        if key in ['href', 'src', 'alt']}
-        
-        allowed_tags = ['p', 'a', 'b', 'strong', 'i', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-                       'ul', 'ol', 'li', 'blockquote', 'img', 'article', 'section', 'figure',
-                       'figcaption', 'div', 'span']
+        # Allow-listing, attribute filtering and empty-node pruning in one pass
+        with metrics.stage('sanitize'):
+            return sanitize_html(html_content, parser=SANITIZER_PARSER)
+    except Exception as e:
+        print(f'Error cleaning HTML: {str(e)}')
+        traceback.print_exc()
+        return html_content
+
+async def process_article(url, preview_data, fetcher):
+    print(f'\nProcessing article: {url}')
+    try:
+        article_data = {
+            'title': preview_data['title'],
+            'author': preview_data['author'],
+            'publishedDate': preview_data['date'],
+            'excerpt': preview_data['excerpt'],
+            'categories': preview_data['categories'],
+            'sourceUrl': url,
+            'fileName': clean_filename(preview_data['title']),
+            'images': [],
+            'commentsCount': preview_data['comments_count'],
+            'featuredImage': None,
+            'content': ''
+        }
         
-        for tag in soup.find_all(True):
-            if tag.name not in allowed_tags:
-                tag.unwrap()
+        if preview_data.get('content'):
+            # Delivered by the REST API with the rest of the post
+            content = preview_data['content']
+        else:
+            # HTTP first, the browser pool only when the selectors come back empty
+            content, _ = await fetcher.fetch_content(url)
         
-        for tag in soup.find_all():
-            if len(tag.get_text(strip=True)) == 0 and not tag.find_all(['img']):
-                tag.decompose()
+        if content:
+            article_data['content'] = clean_html_content(content)
+            print(f'Content length: {len(article_data["content"])} characters')
+        else:
+            print('No content found!')
         
-        cleaned_html = str(soup)
-        cleaned_html = re.sub(r'\n\s*\n', '\n', cleaned_html)
-        cleaned_html = re.sub(r'>\s+<', '>\n<', cleaned_html)
+        return article_data
         
-        return cleaned_html
     except Exception as e:
-        print(f'Error cleaning HTML: {str(e)}')
+        print(f'Error processing article {url}: {str(e)}')
         traceback.print_exc()
-        return html_content
+        return None
 
-async def process_article(url, preview_data, state):
-    async with state.semaphore:  # Limit concurrent processing
-        print(f'\nProcessing article: {url}')
-        try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,  # Changed to headless
-                    args=['--disable-gpu', '--disable-dev-shm-usage', '--no-sandbox']
-                )
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    java_script_enabled=True,
-                    bypass_csp=True,
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                )
-                
-                page = await context.new_page()
-                page.set_default_timeout(PAGE_LOAD_TIMEOUT)
-                
-                print(f'Loading article page: {url}')
-                await page.goto(url, wait_until='networkidle', timeout=NAVIGATION_TIMEOUT)
-                await asyncio.sleep(3)  # Increased wait time
-                
-                # Additional wait for dynamic content
-                try:
-                    await page.wait_for_selector('.entry-content', timeout=10000)
-                except:
-                    pass
-                
-                article_data = {
-                    'title': preview_data['title'],
-                    'author': preview_data['author'],
-                    'publishedDate': preview_data['date'],
-                    'excerpt': preview_data['excerpt'],
-                    'categories': preview_data['categories'],
-                    'sourceUrl': url,
-                    'fileName': clean_filename(preview_data['title']),
-                    'images': [],
-                    'commentsCount': preview_data['comments_count'],
-                    'featuredImage': None,
-                    'content': ''
-                }
-                
-                content_selectors = [
-                    'article.jeg_post.jeg_pl_lg_2',
-                    '.entry-content',
-                    '.content-inner',
-                    '.jeg_post_content',
-                    'article'  # Added fallback
-                ]
-                
-                content = None
-                for selector in content_selectors:
-                    try:
-                        content_elem = await page.query_selector(selector)
-                        if content_elem:
-                            content = await content_elem.inner_html()
-                            print(f'Found content using selector: {selector}')
-                            break
-                    except:
-                        continue
-                
-                if content:
-                    article_data['content'] = clean_html_content(content)
-                    print(f'Content length: {len(article_data["content"])} characters')
-                else:
-                    print('No content found!')
-                
-                await page.close()
-                await browser.close()
+async def scrape_listing_page(pool, url, page_num):
+    """Return the article previews on one listing page, or None past the last page"""
+    previews = []
+    with metrics.stage('listing', metrics.host_of(url)):
+        async with pool.page() as page:
+            # Wait for either the article list or the end-of-listing message
+            response = await load_page_async(page, url, f'{WARROOM_PREVIEWS["item"]}, {END_OF_LISTING}', timeout=NAVIGATION_TIMEOUT)
+            check_response(url, response)  # 404 past the last page is handled below
+            
+            error_elem = await page.query_selector(END_OF_LISTING)
+            if error_elem:
+                print(f'Reached end of articles at page {page_num}')
+                return None
+            
+            # One evaluate() for the whole page instead of a round-trip per field
+            rows = await extract_items_async(page, WARROOM_PREVIEWS)
+            if not rows:
+                print('No more articles found, stopping...')
+                return None
+            
+            print(f'Found {len(rows)} articles on page {page_num}')
+            
+            for row in rows:
+                if not row['url']:
+                    continue
                 
-                return article_data
+                print(f'\nFound article: {row["title"]}')
+                print(f'URL: {row["url"]}')
                 
-        except Exception as e:
-            print(f'Error processing article {url}: {str(e)}')
-            traceback.print_exc()
-            return None
+                previews.append({
+                    'url': row['url'],
+                    'title': row['title'],
+                    'excerpt': row['excerpt'] if row['excerpt'] is not None else '',
+                    'author': row['author'] if row['author'] is not None else 'Warroom Staff',
+                    'date': format_date(row['date']) if row['date'] is not None else datetime.now().strftime('%Y-%m-%d'),
+                    'categories': ['News'],
+                    'comments_count': 0
+                })
+        
+        return previews
+
+async def listing_producer(pool, url_queue, state, store, controller):
+    """Feed new article previews into the queue, scraping listing pages ahead of the workers"""
+    next_page, frontier = store.start_run()
+    state.completed_page = next_page - 1
+    in_flight = []  # (page_num, url, task) in page order
+    
+    try:
+        while True:
+            # Keep LISTING_PREFETCH listing pages loading while the workers drain the queue
+            while len(in_flight) < LISTING_PREFETCH:
+                url = f'{LISTING_URL}page/{next_page}/' if next_page > 1 else LISTING_URL
+                print(f'\nScraping page {next_page}: {url}')
+                task = asyncio.create_task(controller.call(url, scrape_listing_page, pool, url, next_page))
+                in_flight.append((next_page, url, task))
+                next_page += 1
+            
+            page_num, url, task = in_flight.pop(0)
+            try:
+                previews = await task
+            except Exception as e:
+                print(f'Error processing page {url}: {str(e)}')
+                traceback.print_exc()
+                continue
+            
+            if previews is None:
+                break
+            
+            new_previews = [p for p in previews if not store.is_seen(p['url'])]
+            if previews and not new_previews and page_num > frontier:
+                print(f'Page {page_num} only contains known articles, crawl is up to date')
+                break
+            
+            state.increment_page()
+            store.page_reached(page_num)
+            print(f'{len(new_previews)} new articles on page {page_num}')
+            completed = state.add_page(page_num, len(new_previews))
+            store.page_completed(completed)
+            for preview_data in new_previews:
+                store.mark_queued(preview_data['url'])
+                preview_data['page'] = page_num
+                await url_queue.put(preview_data)  # Blocks while the workers are behind
+    finally:
+        for _, _, task in in_flight:
+            task.cancel()
+        await asyncio.gather(*(task for _, _, task in in_flight), return_exceptions=True)
+
+def api_since(store):
+    """modified_after for a fresh API run: the last complete sync, minus the overlap"""
+    synced = store.get('api_synced')
+    if not synced:
+        return ''
+    return (datetime.fromisoformat(synced) - API_SYNC_OVERLAP).strftime('%Y-%m-%dT%H:%M:%S')
 
-async def scrape_articles():
+async def api_producer(api, url_queue, state, store, modified_after=None):
+    """Feed posts from the REST API into the queue, content included.
+
+    Batches are numbered like listing pages for the completion accounting;
+    the crawl state keeps the cursor of the last fully saved batch, which is
+    where an interrupted run resumes.
+    """
+    batch_num, _ = store.start_run(source='api')
+    state.completed_page = batch_num - 1
+    if batch_num == 1:
+        store.set('api_cursor', modified_after or api_since(store))
+        store.checkpoint()
+    cursor = store.get('api_cursor') or None
+
+    async for posts, next_cursor in api.iter_pages(cursor):
+        previews = [post_to_preview(post) for post in posts]
+        # Edited posts can show up twice in the same run
+        new_previews = [p for p in previews if p['url'] not in store.queued]
+        state.increment_page()
+        store.page_reached(batch_num)
+        store.page_cursor(batch_num, next_cursor)
+        print(f'{len(new_previews)} posts in API batch {batch_num}')
+        metrics.inc('api_posts_total', len(posts))
+        completed = state.add_page(batch_num, len(new_previews))
+        store.page_completed(completed)
+        for preview_data in new_previews:
+            store.mark_queued(preview_data['url'])
+            preview_data['page'] = batch_num
+            await url_queue.put(preview_data)
+        batch_num += 1
+
+async def article_worker(fetcher, url_queue, result_queue, state):
+    while True:
+        preview_data = await url_queue.get()
+        try:
+            if preview_data is None:
+                return
+            result = await process_article(preview_data['url'], preview_data, fetcher)
+            # Failures are reported too so the writer can account for the listing page
+            await result_queue.put((preview_data['page'], result))
+        finally:
+            url_queue.task_done()
+
+async def result_writer(result_queue, state, store, checkpoint_log):
+    """Append finished articles to the checkpoint log as they arrive"""
+    while True:
+        item = await result_queue.get()
+        if item is None:
+            return
+        page_num, result = item
+        if result and store.is_unchanged(result):
+            # The API returns posts again after any edit, often to metadata we don't keep
+            metrics.inc('articles_total', result='unchanged')
+        elif result:
+            state.articles.append(result)
+            state.increment_processed()
+            # Log first: the crawl state must never get ahead of what is on disk
+            with metrics.stage('checkpoint_append'):
+                checkpoint_log.append(result)
+            store.record_article(result)
+            metrics.inc('articles_total', result='ok')
+            print(f'Successfully processed article {len(state.articles)}')
+            
+            if len(state.articles) % SAVE_EVERY == 0:
+                with metrics.stage('checkpoint_save'):
+                    store.checkpoint()
+        else:
+            metrics.inc('articles_total', result='failed')
+        store.page_completed(state.article_done(page_num))
+
+async def scrape_articles(memory_budget=MEMORY_BUDGET_MB, source='api', modified_after=None):
     print('Starting scraper...')
     state = SharedState()
+    store = CrawlState()
+    store.bootstrap(iter_existing_articles())
+    
+    # Articles an interrupted run finished but never compacted
+    checkpoint_log = ArticleCheckpoint()
+    state.articles = checkpoint_log.read()
+    if state.articles:
+        print(f'Recovered {len(state.articles)} articles from {checkpoint_log.path}')
+        for article in state.articles:
+            store.record_article(article)
+        store.checkpoint()
+    finished = False
     
     async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,  # Changed to headless
-            args=['--disable-gpu', '--disable-dev-shm-usage', '--no-sandbox']
-        )
-        context = await browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            java_script_enabled=True,
-            bypass_csp=True,
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        # One browser for the whole crawl; workers borrow tabs from the pool
+        # (extra tabs are reserved for the listing pages being prefetched)
+        # With the REST API Chromium is only needed for posts it returns without content
+        pool = await BrowserPool(p, MAX_CONCURRENT + LISTING_PREFETCH, page_timeout=PAGE_LOAD_TIMEOUT).start(
+            launch=source != 'api')
+        # Recycles the pool before Chromium outgrows the runner on long backfills
+        watchdog = MemoryWatchdog(pool, memory_budget).start()
+        # Shared by listing pages and both fetchers: one view of how the origin is coping
+        controller = RateController(AdaptiveLimiter(max_limit=MAX_CONCURRENT))
+        fetcher = FallbackFetcher(
+            HttpFetcher(max_connections=MAX_CONCURRENT, controller=controller),
+            BrowserFetcher(pool, navigation_timeout=NAVIGATION_TIMEOUT, controller=controller)
         )
+        api = WordPressAPI(POSTS_API_URL, controller=controller)
         
-        page = await context.new_page()
-        page.set_default_timeout(PAGE_LOAD_TIMEOUT)
-        page_num = 1
-        base_url = 'https://warroom.org/category/newsroom/'
+        # listing or API pages -> url_queue -> workers -> result_queue -> writer
+        url_queue = asyncio.Queue(maxsize=URL_QUEUE_SIZE)
+        result_queue = asyncio.Queue()
+        writer = asyncio.create_task(result_writer(result_queue, state, store, checkpoint_log))
+        workers = [
+            asyncio.create_task(article_worker(fetcher, url_queue, result_queue, state))
+            for _ in range(MAX_CONCURRENT)
+        ]
         
         try:
-            while True:
-                url = f'{base_url}page/{page_num}/' if page_num > 1 else base_url
-                print(f'\nScraping page {page_num}: {url}')
-                
-                try:
-                    await page.goto(url, wait_until='networkidle', timeout=NAVIGATION_TIMEOUT)
-                    await asyncio.sleep(3)  # Increased wait time
-                    
-                    # Additional wait for article list
-                    try:
-                        await page.wait_for_selector('article.jeg_post', timeout=10000)
-                    except:
-                        pass
-                    
-                    error_elem = await page.query_selector('.jeg_404_content, .jeg_empty_content')
-                    if error_elem:
-                        print(f'Reached end of articles at page {page_num}')
-                        break
-                    
-                    article_previews = await page.query_selector_all('article.jeg_post')
-                    if not article_previews:
-                        print('No more articles found, stopping...')
-                        break
-                        
-                    print(f'Found {len(article_previews)} articles on page {page_num}')
-                    
-                    # Process articles concurrently
-                    tasks = []
-                    for preview in article_previews:
-                        try:
-                            link = await preview.query_selector('h3.jeg_post_title a')
-                            if not link:
-                                continue
-                                
-                            article_url = await link.get_attribute('href')
-                            title = await link.inner_text()
-                            
-                            print(f'\nFound article: {title}')
-                            print(f'URL: {article_url}')
-                            
-                            preview_data = {
-                                'url': article_url,
-                                'title': title,
-                                'excerpt': '',
-                                'author': 'Warroom Staff',
-                                'date': datetime.now().strftime('%Y-%m-%d'),
-                                'categories': ['News'],
-                                'comments_count': 0
-                            }
-                            
-                            excerpt_elem = await preview.query_selector('.jeg_post_excerpt p')
-                            if excerpt_elem:
-                                preview_data['excerpt'] = await excerpt_elem.inner_text()
-                                
-                            author_elem = await preview.query_selector('.jeg_meta_author a')
-                            if author_elem:
-                                preview_data['author'] = await author_elem.inner_text()
-                                
-                            date_elem = await preview.query_selector('.jeg_meta_date')
-                            if date_elem:
-                                date_text = await date_elem.inner_text()
-                                preview_data['date'] = format_date(date_text)
-                            
-                            # Add task to process article
-                            task = asyncio.create_task(process_article(article_url, preview_data, state))
-                            tasks.append(task)
-                            
-                        except Exception as e:
-                            print(f'Error processing preview: {str(e)}')
-                            traceback.print_exc()
-                            continue
-                    
-                    # Wait for all article processing tasks to complete
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-                    for result in results:
-                        if result and not isinstance(result, Exception):
-                            state.articles.append(result)
-                            state.increment_processed()
-                            print(f'Successfully processed article {len(state.articles)}')
-                    
-                    # Save progress after each page
-                    save_progress(state.articles, force=True)
-                    page_num += 1
-                    await asyncio.sleep(2)  # Increased wait time between pages
-                    
-                except Exception as e:
-                    print(f'Error processing page {url}: {str(e)}')
-                    traceback.print_exc()
-                    page_num += 1
-                    continue
+            if source == 'api' and await api.available():
+                await api_producer(api, url_queue, state, store, modified_after)
+            else:
+                if source == 'api':
+                    print('Falling back to the listing crawl')
+                    await pool.ensure_browser()  # Fail now rather than on every listing page
+                source = 'listing'
+                await listing_producer(pool, url_queue, state, store, controller)
+            for _ in workers:
+                await url_queue.put(None)
+            await asyncio.gather(*workers)
+            finished = True
                 
         except Exception as e:
             print(f'Error during scraping: {str(e)}')
             traceback.print_exc()
         finally:
-            await page.close()
-            await browser.close()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await result_queue.put(None)
+            await writer
             
-            save_progress(state.articles, force=True)
-            save_articles(state.articles)
-            return state.articles, state
+            print(f'Fetcher hits: {fetcher.hits}')
+            print(f'Browser pool stats: {pool.get_stats()}')
+            print(f'Rate control: {controller.get_stats()}')
+            await watchdog.stop()
+            print(f'Memory: {watchdog.get_stats()}')
+            await fetcher.close()
+            await api.close()
+            await pool.close()
+            
+            store.checkpoint()
+            checkpoint_log.close()
+            try:
+                # A failure here keeps the old archive and the checkpoint log for the next run
+                with metrics.stage('compact'):
+                    compact_articles(state.articles)
+                if finished:
+                    if source == 'api':
+                        store.set('api_synced', store.get('started'))
+                    store.finish_run()
+                    checkpoint_log.clear()
+            finally:
+                store.close()
+        save_articles(state.articles)
+        return state.articles, state
 
 def save_articles(articles):
     print('Saving individual article files...')
@@ -320,49 +430,15 @@ def save_articles(articles):
     
     for article in articles:
         try:
-            html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>{article['title']}</title>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <link rel="stylesheet" href="../assets/css/main.css">
-    <link rel="stylesheet" href="../assets/css/fontawesome-all.min.css">
-</head>
-<body>
-    <article>
-        <h1>{article['title']}</h1>
-        <div class="article-meta">
-            <span class="post-date">{article['publishedDate']}</span>
-            {'<span class="author">By ' + article['author'] + '</span>' if article['author'] else ''}
-            <div class="categories">
-                {' | '.join(article['categories'])}
-            </div>
-            {'<div class="comments-count">' + str(article['commentsCount']) + ' Comments</div>' if article['commentsCount'] > 0 else ''}
-        </div>
-        {f'<div class="featured-image"><img src="{article["featuredImage"]}" alt="{article["title"]}"></div>' if article["featuredImage"] else ''}
-        <div class="excerpt">
-            {article['excerpt']}
-        </div>
-        <div class="entry-content">
-            {article['content']}
-        </div>
-        <div class="source-link">
-            <a href="{article['sourceUrl']}" target="_blank" rel="noopener noreferrer">View Original Article</a>
-        </div>
-    </article>
-</body>
-</html>"""
-            
-            file_path = os.path.join('public/warroom-articles', article['fileName'])
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            # Same layout generate_article_pages.py uses
+            with metrics.stage('page_render'):
+                write_article_page(article, 'public/warroom-articles')
                 
         except Exception as e:
             print(f'Error saving article {article["title"]}: {str(e)}')
             traceback.print_exc()
 
-async def main():
+async def main(memory_budget=MEMORY_BUDGET_MB, source='api', modified_after=None):
     print('Starting scraper...')
     start_time = time.time()
     
@@ -377,7 +453,7 @@ async def main():
         pass
     
     try:
-        articles, state = await scrape_articles()
+        _, state = await scrape_articles(memory_budget, source, modified_after)
         
         end_time = time.time()
         duration = end_time - start_time
@@ -387,8 +463,10 @@ async def main():
         print(f'Pages processed: {stats["pages"]}')
         print(f'Articles found: {stats["articles"]}')
         print(f'Articles processed: {stats["processed"]}')
+        metrics.set_gauge('listing_pages', stats['pages'])
+        metrics.set_gauge('articles_found', stats['articles'])
         
-        save_articles(articles)
+        # scrape_articles() already wrote the JSON and the article pages
         print('Articles saved to public/warroom-articles.json and individual HTML files.')
         
     except KeyboardInterrupt:
@@ -398,6 +476,27 @@ async def main():
         print(f'Fatal error: {str(e)}')
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        metrics.write_run_summary('scrape_warroom')
+
+def iso_datetime(value):
+    # The API rejects dates without a time
+    return datetime.fromisoformat(value).strftime('%Y-%m-%dT%H:%M:%S')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Scrape new War Room articles')
+    parser.add_argument('--source', choices=['api', 'listing'], default='api',
+                        help='read posts from the WordPress REST API (falls back to the listing '
+                             'when the API is unavailable) or crawl the newsroom listing pages')
+    parser.add_argument('--modified-after', metavar='DATE', type=iso_datetime,
+                        help='with --source api, only posts modified after this ISO date '
+                             '(default: since the last complete API run)')
+    memory_watchdog.add_argument(parser)
+    profiling.add_argument(parser)
+    return parser.parse_args()
 
 if __name__ == '__main__':
-    asyncio.run(main()) 
\ No newline at end of file
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    asyncio.run(main(args.memory_budget, args.source, args.modified_after)) 
\ No newline at end of file
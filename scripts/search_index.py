@@ -0,0 +1,618 @@
+"""Full-text search over the War Room articles and the NatBot Brains corpus.
+
+The index is a directory of immutable segments plus a manifest:
+
+    search-index/
+        manifest.json        segments, deleted docs, corpus totals
+        seg-0001.idx         lexicon + postings + doc lengths (mmapped)
+        seg-0001.docs.json   per-doc metadata (id, title, url, kind, hash)
+
+A segment file is laid out as
+
+    header   '<4sHHIIQQQQ'  magic, version, 0, doc count, term count,
+                            offsets of term records, term strings,
+                            postings and doc lengths
+    terms    '<IIIQ' per term, sorted by UTF-8 bytes: string offset,
+             string length, document frequency, postings offset
+    strings  the UTF-8 term strings
+    postings per document: varint doc delta, varint tf, varint byte length
+             of the positions, then tf varint position deltas
+    lengths  uint32 token count per document
+
+so a lookup is a binary search over fixed-size records and only the
+postings of the query terms are ever decoded. New documents are added as
+a new segment; a changed document is marked deleted in its old segment,
+and so is one that is gone from a corpus that was read in full. Deleted
+documents don't count towards N, avgdl or df. `merge` folds everything
+back into one segment.
+
+Usage:
+
+    python scripts/search_index.py build --articles warroom-articles.json
+    python scripts/search_index.py add --articles warroom-articles.json
+    python scripts/search_index.py query 'border "national security"'
+    python scripts/search_index.py export search
+"""
+import argparse
+import glob
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import time
+from array import array
+from html.parser import HTMLParser
+
+from article_corpus import SITE_ARTICLES_FILE, iter_articles, write_json_atomic
+from crawl_state import content_hash
+import metrics
+import profiling
+
+SEARCH_INDEX_DIR = 'search-index'
+SEARCH_EXPORT_DIR = 'search'
+NATBOT_DIR = 'NatBot Brains V1.0'
+ARTICLE_URL_PREFIX = '/warroom-articles/'
+PASSAGE_WORDS = 300  # NatBot text is indexed in passages of about this many words
+EXPORT_SHARDS = 64
+MAX_SEGMENTS = 8  # `add` merges once there are more segments than this
+K1 = 1.2
+B = 0.75
+
+MAGIC = b'NBSX'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIQQQQ')
+TERM = struct.Struct('<IIIQ')
+
+TOKEN_RE = re.compile(r'\w+')
+PHRASE_RE = re.compile(r'"([^"]+)"')
+SKIPPED_TAGS = frozenset(['script', 'style'])
+BLOCK_TAGS = frozenset(['p', 'div', 'br', 'li', 'ul', 'ol', 'blockquote', 'figure', 'figcaption',
+                        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'table', 'tr'])
+
+if sys.byteorder != 'little':
+    raise ImportError('search_index segments are little-endian only')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+        else:
+            self.parts.append('\n' if tag in BLOCK_TAGS else ' ')
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skipping:
+            self.skipping -= 1
+        else:
+            self.parts.append('\n' if tag in BLOCK_TAGS else ' ')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Visible text of an HTML fragment, with a newline at every block boundary"""
+    extractor = _TextExtractor()
+    extractor.feed(html or '')
+    extractor.close()
+    return ''.join(extractor.parts)
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+# Documents ----------------------------------------------------------------
+
+def iter_article_docs(path=SITE_ARTICLES_FILE):
+    """Yield index documents for every article in the corpus"""
+    for article in iter_articles(path):
+        text = ' '.join([
+            article.get('title') or '',
+            article.get('excerpt') or '',
+            html_to_text(article.get('content'))
+        ])
+        yield {
+            'id': article['sourceUrl'],
+            'title': article.get('title') or '',
+            'url': ARTICLE_URL_PREFIX + article['fileName'] if article.get('fileName') else article['sourceUrl'],
+            'kind': 'article',
+            'hash': content_hash(text),
+            'text': text
+        }
+
+
+def iter_natbot_docs(directory=NATBOT_DIR, passage_words=PASSAGE_WORDS):
+    """Yield NatBot text as passages of whole paragraphs, about `passage_words` long"""
+    for path in sorted(glob.glob(os.path.join(directory, '*.txt'))):
+        name = os.path.basename(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            paragraphs = [p.strip() for p in f.read().split('\n\n') if p.strip()]
+        passage, words, number = [], 0, 0
+        for paragraph in paragraphs + [None]:
+            if paragraph is not None:
+                passage.append(paragraph)
+                words += len(paragraph.split())
+            if passage and (paragraph is None or words >= passage_words):
+                number += 1
+                text = '\n\n'.join(passage)
+                yield {
+                    'id': f'natbot/{name}#{number}',
+                    'title': passage[0][:80],
+                    'url': None,
+                    'kind': 'natbot',
+                    'hash': content_hash(text),
+                    'text': text
+                }
+                passage, words = [], 0
+
+
+# Segments -----------------------------------------------------------------
+
+def write_segment(path, postings, doc_lengths):
+    """Write a segment from {term: [(local doc, [positions]), ...]} with docs in ascending order"""
+    terms = sorted(postings, key=lambda term: term.encode('utf-8'))
+    strings = bytearray()
+    records = bytearray()
+    blob = bytearray()
+    for term in terms:
+        encoded = term.encode('utf-8')
+        entries = postings[term]
+        records += TERM.pack(len(strings), len(encoded), len(entries), len(blob))
+        strings += encoded
+        previous = 0
+        for doc, positions in entries:
+            _write_varint(blob, doc - previous)
+            previous = doc
+            _write_varint(blob, len(positions))
+            encoded_positions = bytearray()
+            last = 0
+            for position in positions:
+                _write_varint(encoded_positions, position - last)
+                last = position
+            _write_varint(blob, len(encoded_positions))
+            blob += encoded_positions
+
+    terms_offset = HEADER.size
+    strings_offset = terms_offset + len(records)
+    postings_offset = strings_offset + len(strings)
+    lengths_offset = postings_offset + len(blob)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(doc_lengths), len(terms),
+                            terms_offset, strings_offset, postings_offset, lengths_offset))
+        f.write(records)
+        f.write(strings)
+        f.write(blob)
+        f.write(array('I', doc_lengths).tobytes())
+
+
+class Segment:
+    """Read-only view of one segment file through mmap"""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self._file = open(os.path.join(directory, f'{name}.idx'), 'rb')
+        self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.doc_count, self.term_count, self.terms_offset,
+         self.strings_offset, self.postings_offset, self.lengths_offset) = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{name}.idx is not a version {VERSION} search segment')
+        self.doc_lengths = array('I')
+        self.doc_lengths.frombytes(self.buf[self.lengths_offset:self.lengths_offset + 4 * self.doc_count])
+        with open(os.path.join(directory, f'{name}.docs.json'), 'r', encoding='utf-8') as f:
+            self.docs = json.load(f)
+
+    def close(self):
+        self.buf.close()
+        self._file.close()
+
+    def _term_at(self, index):
+        str_off, str_len, df, post_off = TERM.unpack_from(self.buf, self.terms_offset + index * TERM.size)
+        start = self.strings_offset + str_off
+        return self.buf[start:start + str_len], df, post_off
+
+    def lookup(self, term):
+        """Return (df, postings start, postings end) for `term`, or None"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current, df, post_off = self._term_at(mid)
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                if mid + 1 < self.term_count:
+                    end = self.postings_offset + self._term_at(mid + 1)[2]
+                else:
+                    end = self.lengths_offset
+                return df, self.postings_offset + post_off, end
+        return None
+
+    def postings(self, term, with_positions=False):
+        """Yield (local doc, tf, positions or None) for `term`"""
+        found = self.lookup(term)
+        if not found:
+            return
+        _, pos, end = found
+        buf = self.buf
+        doc = 0
+        while pos < end:
+            delta, pos = _read_varint(buf, pos)
+            doc += delta
+            tf, pos = _read_varint(buf, pos)
+            size, pos = _read_varint(buf, pos)
+            positions = None
+            if with_positions:
+                positions = []
+                last = 0
+                stop = pos + size
+                while pos < stop:
+                    delta, pos = _read_varint(buf, pos)
+                    last += delta
+                    positions.append(last)
+            else:
+                pos += size
+            yield doc, tf, positions
+
+    def iter_terms(self):
+        for index in range(self.term_count):
+            yield self._term_at(index)[0].decode('utf-8')
+
+
+# Index --------------------------------------------------------------------
+
+class SearchIndex:
+    """A directory of segments with BM25 ranking and phrase queries across all of them"""
+
+    def __init__(self, directory=SEARCH_INDEX_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'segments': [], 'deleted': {}, 'next_segment': 1, 'k1': K1, 'b': B}
+        self.segments = [Segment(directory, entry['name']) for entry in self.manifest['segments']]
+        self.deleted = {name: set(docs) for name, docs in self.manifest['deleted'].items()}
+        # External doc id -> (segment name, local doc, hash, kind) for live docs
+        self.locations = {}
+        self.live_tokens = 0
+        for segment in self.segments:
+            dead = self.deleted.get(segment.name, ())
+            for local, doc in enumerate(segment.docs):
+                if local not in dead:
+                    self.locations[doc['id']] = (segment.name, local, doc['hash'], doc['kind'])
+                    self.live_tokens += segment.doc_lengths[local]
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    @property
+    def doc_count(self):
+        return len(self.locations)
+
+    def _save_manifest(self):
+        self.manifest['deleted'] = {name: sorted(docs) for name, docs in self.deleted.items() if docs}
+        write_json_atomic(self.manifest_path, self.manifest, indent=2)
+
+    def _delete(self, location):
+        name, local = location[:2]
+        self.deleted.setdefault(name, set()).add(local)
+        by_name = {segment.name: segment for segment in self.segments}
+        self.live_tokens -= by_name[name].doc_lengths[local]
+
+    def add(self, docs, complete_kinds=()):
+        """Index new and changed documents as one new segment; returns (indexed, removed).
+
+        `docs` listing the same id twice keeps the last one. Live documents
+        of a kind in `complete_kinds` that `docs` didn't list are deleted.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        postings = {}
+        doc_lengths = []
+        metadata = []
+        batch = {}  # id -> local doc in the new segment
+        superseded = set()  # Local docs in the new segment listed again later
+        listed = set()
+        for doc in docs:
+            listed.add(doc['id'])
+            if doc['id'] in batch:
+                earlier = batch[doc['id']]
+                if metadata[earlier]['hash'] == doc['hash']:
+                    continue
+                superseded.add(earlier)
+            else:
+                known = self.locations.get(doc['id'])
+                if known and known[2] == doc['hash']:
+                    continue
+                if known:
+                    self._delete(self.locations.pop(doc['id']))
+            local = len(metadata)
+            batch[doc['id']] = local
+            tokens = tokenize(doc['text'])
+            term_positions = {}
+            for position, token in enumerate(tokens):
+                term_positions.setdefault(token, []).append(position)
+            for term, positions in term_positions.items():
+                postings.setdefault(term, []).append((local, positions))
+            doc_lengths.append(len(tokens))
+            metadata.append({key: doc[key] for key in ('id', 'title', 'url', 'kind', 'hash')})
+
+        removed = 0
+        for doc_id, location in list(self.locations.items()):
+            if location[3] in complete_kinds and doc_id not in listed:
+                self._delete(self.locations.pop(doc_id))
+                removed += 1
+
+        if metadata:
+            name = f"seg-{self.manifest['next_segment']:04d}"
+            self.manifest['next_segment'] += 1
+            write_segment(os.path.join(self.directory, f'{name}.idx'), postings, doc_lengths)
+            write_json_atomic(os.path.join(self.directory, f'{name}.docs.json'), metadata, ensure_ascii=False)
+            self.manifest['segments'].append({'name': name, 'docs': len(metadata), 'tokens': sum(doc_lengths)})
+            segment = Segment(self.directory, name)
+            self.segments.append(segment)
+            if superseded:
+                self.deleted[name] = superseded
+            for local, doc in enumerate(metadata):
+                if local not in superseded:
+                    self.locations[doc['id']] = (name, local, doc['hash'], doc['kind'])
+                    self.live_tokens += doc_lengths[local]
+        self._save_manifest()
+        return len(metadata) - len(superseded), removed
+
+    def merge(self):
+        """Rewrite every live document into a single segment and drop the old ones"""
+        postings = {}
+        doc_lengths = []
+        metadata = []
+        remap = {}
+        for segment in self.segments:
+            dead = self.deleted.get(segment.name, set())
+            for local, doc in enumerate(segment.docs):
+                if local not in dead:
+                    remap[segment.name, local] = len(metadata)
+                    metadata.append(doc)
+                    doc_lengths.append(segment.doc_lengths[local])
+        for segment in self.segments:
+            for term in segment.iter_terms():
+                entries = postings.setdefault(term, [])
+                for local, _, positions in segment.postings(term, with_positions=True):
+                    new = remap.get((segment.name, local))
+                    if new is not None:
+                        entries.append((new, positions))
+        postings = {term: entries for term, entries in postings.items() if entries}
+
+        old = [entry['name'] for entry in self.manifest['segments']]
+        self.close()
+        name = f"seg-{self.manifest['next_segment']:04d}"
+        self.manifest['next_segment'] += 1
+        write_segment(os.path.join(self.directory, f'{name}.idx'), postings, doc_lengths)
+        write_json_atomic(os.path.join(self.directory, f'{name}.docs.json'), metadata, ensure_ascii=False)
+        self.manifest['segments'] = [{'name': name, 'docs': len(metadata), 'tokens': sum(doc_lengths)}]
+        self.deleted = {}
+        self._save_manifest()
+        for old_name in old:
+            for suffix in ('.idx', '.docs.json'):
+                os.remove(os.path.join(self.directory, old_name + suffix))
+        self.__init__(self.directory)
+
+    def _stats(self):
+        docs = len(self.locations)
+        return docs, (self.live_tokens / docs if docs else 0.0)
+
+    def search(self, query, limit=10):
+        """Return [(score, doc metadata)] for `query`; "quoted phrases" must match exactly"""
+        phrases = [tokenize(phrase) for phrase in PHRASE_RE.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        terms = list(dict.fromkeys(tokenize(PHRASE_RE.sub(' ', query)) + [t for p in phrases for t in p]))
+        if not terms:
+            return []
+        total_docs, avgdl = self._stats()
+        k1, b = self.manifest['k1'], self.manifest['b']
+        phrase_terms = {term for phrase in phrases for term in phrase}
+        # Live postings of every query term, decoded once; df comes from the same pass
+        live = {}
+        df = {term: 0 for term in terms}
+        for segment in self.segments:
+            dead = self.deleted.get(segment.name, ())
+            for term in terms:
+                entries = [entry for entry in segment.postings(term, with_positions=term in phrase_terms)
+                           if entry[0] not in dead]
+                live[segment.name, term] = entries
+                df[term] += len(entries)
+
+        results = []
+        for segment in self.segments:
+            scores = {}
+            positions = {}
+            for term in terms:
+                if not df[term]:
+                    continue
+                idf = math.log(1 + (total_docs - df[term] + 0.5) / (df[term] + 0.5))
+                want_positions = term in phrase_terms
+                for doc, tf, doc_positions in live[segment.name, term]:
+                    norm = k1 * (1 - b + b * segment.doc_lengths[doc] / avgdl)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+                    if want_positions:
+                        positions[term, doc] = doc_positions
+            for doc, score in scores.items():
+                if all(_has_phrase(phrase, doc, positions) for phrase in phrases):
+                    results.append((score, segment.name, doc))
+
+        top = heapq.nlargest(limit, results)
+        by_name = {segment.name: segment for segment in self.segments}
+        return [(score, by_name[name].docs[doc]) for score, name, doc in top]
+
+    def export(self, out_dir=SEARCH_EXPORT_DIR, shards=EXPORT_SHARDS):
+        """Write a static copy for client-side search: docs, meta and term shards picked by FNV-1a"""
+        if os.path.isdir(out_dir):
+            shutil.rmtree(out_dir)
+        os.makedirs(out_dir)
+        docs = []
+        remap = {}
+        for segment in self.segments:
+            dead = self.deleted.get(segment.name, set())
+            for local, doc in enumerate(segment.docs):
+                if local not in dead:
+                    remap[segment.name, local] = len(docs)
+                    docs.append([doc['title'], doc['url'], doc['kind'], segment.doc_lengths[local]])
+        shard_terms = [{} for _ in range(shards)]
+        for segment in self.segments:
+            for term in segment.iter_terms():
+                entries = shard_terms[fnv1a(term) % shards].setdefault(term, [])
+                for local, _, positions in segment.postings(term, with_positions=True):
+                    new = remap.get((segment.name, local))
+                    if new is not None:
+                        entries.append([new] + positions)
+        total_tokens = sum(doc[3] for doc in docs)
+        dump = dict(separators=(',', ':'), ensure_ascii=False)
+        write_json_atomic(os.path.join(out_dir, 'docs.json'), docs, **dump)
+        write_json_atomic(os.path.join(out_dir, 'meta.json'), {
+            'docs': len(docs),
+            'avgdl': total_tokens / len(docs) if docs else 0,
+            'k1': self.manifest['k1'],
+            'b': self.manifest['b'],
+            'shards': shards
+        }, **dump)
+        for number, terms in enumerate(shard_terms):
+            write_json_atomic(os.path.join(out_dir, f'terms-{number}.json'),
+                              {term: entries for term, entries in terms.items() if entries}, **dump)
+        print(f'Exported {len(docs)} documents in {shards} shards to {out_dir}')
+
+
+def fnv1a(term):
+    """32-bit FNV-1a of the UTF-8 bytes; assets/js/site-search.js computes the same"""
+    value = 0x811c9dc5
+    for byte in term.encode('utf-8'):
+        value = ((value ^ byte) * 0x01000193) & 0xffffffff
+    return value
+
+
+def _has_phrase(phrase, doc, positions):
+    starts = set(positions.get((phrase[0], doc), ()))
+    for offset, term in enumerate(phrase[1:], 1):
+        following = positions.get((term, doc), ())
+        starts &= {position - offset for position in following}
+        if not starts:
+            return False
+    return bool(starts)
+
+
+def source_kinds(args):
+    """Kinds of document whose source is there to be read in full"""
+    kinds = set()
+    if args.articles and os.path.exists(args.articles):
+        kinds.add('article')
+    elif args.articles:
+        print(f'{args.articles} not found, skipping articles')
+    if args.natbot and os.path.isdir(args.natbot):
+        kinds.add('natbot')
+    return kinds
+
+
+def iter_sources(args, kinds):
+    if 'article' in kinds:
+        yield from iter_article_docs(args.articles)
+    if 'natbot' in kinds:
+        yield from iter_natbot_docs(args.natbot)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build and query the full-text search index')
+    parser.add_argument('--index', default=SEARCH_INDEX_DIR, help='index directory')
+    profiling.add_argument(parser)
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('build', 'index everything from scratch'),
+                               ('add', 'index new and changed documents as a new segment')):
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument('--articles', default=SITE_ARTICLES_FILE, help='article corpus (JSON array or JSONL)')
+        sub.add_argument('--natbot', default=NATBOT_DIR, help='directory of NatBot .txt files')
+    query = commands.add_parser('query', help='search the index')
+    query.add_argument('text')
+    query.add_argument('-k', type=int, default=10, help='number of results')
+    export = commands.add_parser('export', help='write the sharded static index for the site')
+    export.add_argument('out_dir', nargs='?', default=SEARCH_EXPORT_DIR)
+    export.add_argument('--shards', type=int, default=EXPORT_SHARDS)
+    commands.add_parser('merge', help='fold all segments into one')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    if args.command == 'build' and os.path.isdir(args.index):
+        shutil.rmtree(args.index)
+    index = SearchIndex(args.index)
+    try:
+        if args.command in ('build', 'add'):
+            start = time.time()
+            kinds = source_kinds(args)
+            with metrics.stage('index_add'):
+                added, removed = index.add(iter_sources(args, kinds), complete_kinds=kinds)
+            if len(index.segments) > MAX_SEGMENTS:
+                with metrics.stage('index_merge'):
+                    index.merge()
+            metrics.inc('documents_indexed_total', added)
+            metrics.inc('documents_removed_total', removed)
+            metrics.set_gauge('documents', index.doc_count)
+            metrics.set_gauge('segments', len(index.segments))
+            print(f'Indexed {added} documents and removed {removed} in {time.time() - start:.1f}s '
+                  f'({index.doc_count} live documents, {len(index.segments)} segments)')
+        elif args.command == 'query':
+            start = time.perf_counter()
+            with metrics.stage('query'):
+                results = index.search(args.text, args.k)
+            elapsed = (time.perf_counter() - start) * 1000
+            for score, doc in results:
+                print(f"{score:7.3f}  [{doc['kind']}] {doc['title']}")
+                print(f"         {doc['url'] or doc['id']}")
+            print(f'{len(results)} results in {elapsed:.1f} ms')
+        elif args.command == 'export':
+            with metrics.stage('index_export'):
+                index.export(args.out_dir, args.shards)
+        elif args.command == 'merge':
+            with metrics.stage('index_merge'):
+                index.merge()
+            print(f'Merged into {len(index.segments)} segment ({index.doc_count} documents)')
+    finally:
+        index.close()
+        if args.command != 'query' or args.profile:
+            metrics.write_run_summary('search_index')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,228 @@
-# Path to your local sitemap.xml file (in the root of your repository)
+# Builds sitemap.xml as a sitemap index over gzipped child sitemaps
 SITEMAP_FILE = "sitemap.xml"
+STATIC_SITEMAP_FILE = "sitemap-static.xml"  # Hand-maintained pages, edited like the old sitemap.xml
+SITEMAP_DIR = "sitemaps"
+SITEMAP_STATE_FILE = "scripts/sitemap-state.json"  # Committed with the sitemaps, outside the published pages
+SITE_URL = "https://nataliegwinters.com"
+ARTICLE_URL_PREFIX = f"{SITE_URL}/warroom-articles/"
+MAX_URLS_PER_SITEMAP = 50000  # Limit from the sitemap protocol
+ARTICLE_CHANGEFREQ = "monthly"
+ARTICLE_PRIORITY = "0.3"
 
-# Your script's logic for updating the sitemap
+# Pages whose lastmod follows the feed they are built from
+FEED_LASTMOD = {
+    f"{SITE_URL}/videos": "videos/natalie/index.json",
+    f"{SITE_URL}/warroom-videos": "videos/warroom/index.json",
+}
+
+import argparse
+import gzip
+import hashlib
+import json
 import os
 import xml.etree.ElementTree as ET
+from datetime import date
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from article_corpus import SITE_ARTICLES_FILE, atomic_open, iter_articles, write_json_atomic
+from generate_article_pages import MANIFEST_FILE, article_hash
+import metrics
+import profiling
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def entry_hash(*parts):
+    return hashlib.sha256("\x00".join(part or "" for part in parts).encode("utf-8")).hexdigest()
 
-def update_sitemap():
-    # Check if the sitemap.xml exists
-    if not os.path.exists(SITEMAP_FILE):
-        print(f"{SITEMAP_FILE} not found!")
+
+def iter_static_entries(path=STATIC_SITEMAP_FILE):
+    """Yield (loc, lastmod, changefreq, priority, hash) from a plain <urlset> file, streaming"""
+    if not os.path.exists(path):
+        print(f"{path} not found, no static pages in the sitemap")
         return
+    tag = f"{{{SITEMAP_NS}}}"
+    for _, elem in ET.iterparse(path):
+        if elem.tag != f"{tag}url":
+            continue
+        fields = {child.tag[len(tag):]: (child.text or "").strip() for child in elem}
+        loc = fields.get("loc")
+        if loc:
+            lastmod = _feed_lastmod(loc) or fields.get("lastmod")
+            changefreq, priority = fields.get("changefreq"), fields.get("priority")
+            yield loc, lastmod, changefreq, priority, entry_hash(lastmod, changefreq, priority)
+        elem.clear()
+
+
+def _feed_lastmod(loc):
+    index_file = FEED_LASTMOD.get(loc)
+    if not index_file:
+        return None
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            last_updated = json.load(f).get("last_updated")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return last_updated[:10] if last_updated else None
+
+
+def iter_article_entries(articles_file=SITE_ARTICLES_FILE, manifest_file=MANIFEST_FILE):
+    """Yield (loc, publishedDate, changefreq, priority, hash) for every generated article page.
+
+    The hash comes from the page build manifest when the page is in it, so
+    it changes exactly when the rendered page does.
+    """
+    if not os.path.exists(articles_file):
+        print(f"{articles_file} not found, no article pages in the sitemap")
+        return
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            built = json.load(f).get("pages", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        built = {}
+    for article in iter_articles(articles_file):
+        file_name = article.get("fileName")
+        if not file_name:
+            continue
+        digest = built.get(file_name) or article_hash(article)
+        yield (ARTICLE_URL_PREFIX + quote(file_name), article.get("publishedDate"),
+               ARTICLE_CHANGEFREQ, ARTICLE_PRIORITY, digest)
+
+
+def load_state(path=SITEMAP_STATE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"urls": {}, "children": {}}
+
+
+def assign_children(entries, state, today):
+    """Group entries into child sitemaps, keeping every known URL in the child it was in.
+
+    New URLs go to the last child with room, so adding pages only touches
+    that child. lastmod is the entry's own date when first seen and the day
+    its hash changed after that.
+    """
+    urls = state["urls"]
+    counts = {}
+    for info in urls.values():
+        counts[info["child"]] = counts.get(info["child"], 0) + 1
+    next_child = max(counts, default=1)
+
+    children = {}
+    seen = set()
+    for loc, lastmod, changefreq, priority, digest in entries:
+        if loc in seen:
+            continue
+        seen.add(loc)
+        info = urls.get(loc)
+        if info is None:
+            while counts.get(next_child, 0) >= MAX_URLS_PER_SITEMAP:
+                next_child += 1
+            info = urls[loc] = {"child": next_child, "hash": digest, "lastmod": lastmod or today}
+            counts[next_child] = counts.get(next_child, 0) + 1
+        elif info["hash"] != digest:
+            info["hash"] = digest
+            info["lastmod"] = today
+        children.setdefault(info["child"], []).append((loc, info["lastmod"], changefreq, priority))
+
+    # Forget pages that are gone so their slots can be reused
+    for loc in list(urls):
+        if loc not in seen:
+            del urls[loc]
+    return children
+
+
+def render_urlset(entries):
+    parts = [f"<?xml version='1.0' encoding='utf-8'?>\n<urlset xmlns=\"{SITEMAP_NS}\">\n"]
+    for loc, lastmod, changefreq, priority in entries:
+        parts.append(f"<url>\n<loc>{escape(loc)}</loc>\n")
+        if lastmod:
+            parts.append(f"<lastmod>{escape(lastmod)}</lastmod>\n")
+        if changefreq:
+            parts.append(f"<changefreq>{escape(changefreq)}</changefreq>\n")
+        if priority:
+            parts.append(f"<priority>{escape(priority)}</priority>\n")
+        parts.append("</url>\n")
+    parts.append("</urlset>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def render_index(children):
+    parts = [f"<?xml version='1.0' encoding='utf-8'?>\n<sitemapindex xmlns=\"{SITEMAP_NS}\">\n"]
+    for name, lastmod in children:
+        parts.append(f"<sitemap>\n<loc>{SITE_URL}/{SITEMAP_DIR}/{name}</loc>\n")
+        if lastmod:
+            parts.append(f"<lastmod>{lastmod}</lastmod>\n")
+        parts.append("</sitemap>\n")
+    parts.append("</sitemapindex>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def child_name(number):
+    return f"sitemap-{number}.xml.gz"
+
+
+def update_sitemap(force=False):
+    state = load_state()
+    today = date.today().isoformat()
+
+    def entries():
+        yield from iter_static_entries()
+        yield from iter_article_entries()
+
+    with metrics.stage("sitemap_collect"):
+        children = assign_children(entries(), state, today)
+    os.makedirs(SITEMAP_DIR, exist_ok=True)
+
+    rewritten = 0
+    digests = {}
+    index = []
+    for number in sorted(children):
+        body = render_urlset(children[number])
+        digest = hashlib.sha256(body).hexdigest()
+        name = child_name(number)
+        path = os.path.join(SITEMAP_DIR, name)
+        digests[str(number)] = digest
+        if force or state["children"].get(str(number)) != digest or not os.path.exists(path):
+            with metrics.stage("sitemap_write"), atomic_open(path, "wb") as f:
+                f.write(gzip.compress(body, compresslevel=9, mtime=0))
+            rewritten += 1
+        index.append((name, max((lastmod or "" for _, lastmod, _, _ in children[number]), default="")))
+
+    # Children that lost all their entries
+    for number in state["children"]:
+        if number not in digests:
+            path = os.path.join(SITEMAP_DIR, child_name(int(number)))
+            if os.path.exists(path):
+                os.remove(path)
+
+    with atomic_open(SITEMAP_FILE, "wb") as f:
+        f.write(render_index(index))
+    state["children"] = digests
+    os.makedirs(os.path.dirname(SITEMAP_STATE_FILE), exist_ok=True)
+    write_json_atomic(SITEMAP_STATE_FILE, state, indent=1, sort_keys=True)
+
+    total = sum(len(urls) for urls in children.values())
+    metrics.set_gauge("sitemap_urls", total)
+    metrics.inc("sitemaps_rewritten_total", rewritten)
+    print(f"{SITEMAP_FILE} updated: {total} URLs in {len(children)} sitemaps ({rewritten} rewritten)")
 
-    # Parse the XML file
-    tree = ET.parse(SITEMAP_FILE)
-    root = tree.getroot()
 
-    # Logic to update the sitemap (example: update the <lastmod> field)
-    for url in root.findall(".//url"):
-        lastmod = url.find("lastmod")
-        if lastmod is not None:
-            lastmod.text = "2025-02-09"  # Example date (you could automate this)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild the sitemap index and its child sitemaps")
+    parser.add_argument("--force", action="store_true", help="rewrite every child sitemap")
+    profiling.add_argument(parser)
+    return parser.parse_args()
 
-    # Save the updated sitemap
-    tree.write(SITEMAP_FILE)
-    print(f"{SITEMAP_FILE} updated successfully.")
 
 if __name__ == "__main__":
-    update_sitemap()
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    try:
+        update_sitemap(force=args.force)
+    finally:
+        metrics.write_run_summary("update_sitemap")
@@ -0,0 +1,131 @@
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime
+
+from article_corpus import atomic_open, iter_json_array
+import metrics
+import profiling
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+PAGE_SIZE = 21  # One "Load More" click on the video pages
+NATALIE_VIDEOS_FILE = 'natalie-videos.json'
+NATALIE_FEED_DIR = 'videos/natalie'
+WARROOM_FEED_DIR = 'videos/warroom'
+
+
+def _write_if_changed(path, data):
+    """Write `data` (bytes) plus .gz/.br siblings, skipping files whose content is unchanged"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    variants = [(path, data), (path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if BROTLI_AVAILABLE:
+        variants.append((path + '.br', brotli.compress(data, quality=11)))
+    for variant_path, variant in variants:
+        with atomic_open(variant_path, 'wb') as f:
+            f.write(variant)
+    return True
+
+
+def _remove_with_siblings(path):
+    for variant_path in (path, path + '.gz', path + '.br'):
+        if os.path.exists(variant_path):
+            os.remove(variant_path)
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def write_feed(videos, out_dir, page_size=PAGE_SIZE, last_updated=None):
+    """Split `videos` (newest first, any iterable) into minified page-N.json files plus index.json.
+
+    Pages are written as they fill up, so the whole list never has to be in
+    memory. Unchanged pages are left alone and pages past the new end are
+    removed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    total = pages = written = 0
+    page = []
+
+    def flush():
+        nonlocal pages, written
+        pages += 1
+        written += _write_if_changed(os.path.join(out_dir, f'page-{pages}.json'), _dumps(page))
+
+    for video in videos:
+        page.append(video)
+        total += 1
+        if len(page) == page_size:
+            flush()
+            page = []
+    if page or not pages:
+        flush()
+
+    stale = pages + 1
+    while os.path.exists(os.path.join(out_dir, f'page-{stale}.json')):
+        _remove_with_siblings(os.path.join(out_dir, f'page-{stale}.json'))
+        stale += 1
+
+    index_path = os.path.join(out_dir, 'index.json')
+    if not last_updated and not written:
+        # Nothing changed, keep the old timestamp so the index stays byte-identical
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                last_updated = json.load(f).get('last_updated')
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    index = {
+        'last_updated': last_updated or datetime.utcnow().isoformat(),
+        'total': total,
+        'pages': pages,
+        'page_size': page_size
+    }
+    _write_if_changed(index_path, _dumps(index))
+    print(f'Feed {out_dir}: {total} videos in {pages} pages ({written} pages rewritten)')
+    return index
+
+
+def write_natalie_feed(source=NATALIE_VIDEOS_FILE, out_dir=NATALIE_FEED_DIR):
+    return write_feed(iter_json_array(source), out_dir)
+
+
+def write_warroom_feed(store, out_dir=WARROOM_FEED_DIR):
+    return write_feed(store.iter_videos(), out_dir, last_updated=store.manifest['last_updated'])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build the paginated video feeds used by the video pages')
+    parser.add_argument('--natalie', action='store_true', help='only rebuild the Natalie Winters feed')
+    parser.add_argument('--warroom', action='store_true', help='only rebuild the War Room feed')
+    profiling.add_argument(parser)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from video_store import VideoStore
+
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    both = not (args.natalie or args.warroom)
+    try:
+        if args.natalie or both:
+            with metrics.stage('feed_write'):
+                write_natalie_feed()
+        if args.warroom or both:
+            with metrics.stage('feed_write'):
+                write_warroom_feed(VideoStore().load())
+    finally:
+        metrics.write_run_summary('video_feeds')
@@ -0,0 +1,105 @@
+import json
+import os
+from datetime import datetime
+
+from article_corpus import write_json_atomic
+
+VIDEO_STORE_DIR = 'warroom-videos'
+MANIFEST_NAME = 'manifest.json'
+LEGACY_FILE = 'warroom_videos.json'
+ARCHIVE_SHARD = 'archive'  # Videos imported from the legacy file, discovery month unknown
+
+
+class VideoStore:
+    """Video list split into one shard per month of discovery, plus a small manifest.
+
+    Each shard is a JSON array, newest first, and the manifest lists shards
+    oldest first with their counts and the last update time. A run reads
+    every shard once to learn the known links, then rewrites only the shard
+    for the current month and the manifest. The front-end reads the paged
+    feed video_feeds.py builds from the store, not the store itself.
+    """
+
+    def __init__(self, directory=VIDEO_STORE_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.manifest = {'last_updated': None, 'count': 0, 'shards': []}
+        self.links = set()
+        self.current_shard = datetime.utcnow().strftime('%Y-%m')
+        self.current = []  # Contents of the current month's shard
+        self.added = 0
+
+    def _shard_path(self, name):
+        return os.path.join(self.directory, f'{name}.json')
+
+    def _read_shard(self, name):
+        with open(self._shard_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, legacy_file=LEGACY_FILE):
+        """Read the manifest and every shard once; import the legacy single file on first use"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        elif legacy_file and os.path.exists(legacy_file):
+            self._import_legacy(legacy_file)
+
+        for entry in self.manifest['shards']:
+            videos = self._read_shard(entry['name'])
+            if entry['name'] == self.current_shard:
+                self.current = videos
+            for video in videos:
+                self.links.add(video['link'])
+        print(f"Loaded {len(self.links)} known videos from {len(self.manifest['shards'])} shards")
+        return self
+
+    def _import_legacy(self, legacy_file):
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        videos = data['videos'] if isinstance(data, dict) else data
+        print(f'Importing {len(videos)} videos from {legacy_file}')
+        write_json_atomic(self._shard_path(ARCHIVE_SHARD), videos, indent=4)
+        self.manifest['shards'].append({'name': ARCHIVE_SHARD, 'count': len(videos)})
+        self.manifest['count'] = len(videos)
+        self.manifest['last_updated'] = data.get('last_updated') if isinstance(data, dict) else None
+        self._write_manifest()
+
+    def iter_videos(self):
+        """Yield every video, newest first, one shard in memory at a time"""
+        for entry in reversed(self.manifest['shards']):
+            if entry['name'] == self.current_shard:
+                yield from self.current
+            else:
+                yield from self._read_shard(entry['name'])
+
+    def add(self, videos):
+        """Prepend unseen videos (given newest first) and return the ones that were new"""
+        new_videos = []
+        for video in videos:
+            if video['link'] not in self.links:
+                self.links.add(video['link'])
+                new_videos.append(video)
+        if new_videos:
+            self.current = new_videos + self.current
+            self.added += len(new_videos)
+        return new_videos
+
+    def save(self):
+        """Write the current shard and the manifest (only if anything was added)"""
+        if not self.added:
+            return False
+        write_json_atomic(self._shard_path(self.current_shard), self.current, indent=4)
+
+        shards = self.manifest['shards']
+        if shards and shards[-1]['name'] == self.current_shard:
+            shards[-1]['count'] = len(self.current)
+        else:
+            shards.append({'name': self.current_shard, 'count': len(self.current)})
+        self.manifest['count'] = len(self.links)
+        self.manifest['last_updated'] = datetime.utcnow().isoformat()
+        self._write_manifest()
+        self.added = 0
+        return True
+
+    def _write_manifest(self):
+        write_json_atomic(self.manifest_path, self.manifest, indent=4)
@@ -1,15 +1,21 @@
 from playwright.sync_api import sync_playwright
-import json
-import time
+import argparse
 from datetime import datetime, timedelta
 import re
-import os
+from listing_extract import RUMBLE_PAGINATOR, RUMBLE_VIDEOS, extract_items, rumble_pages, rumble_video
+from scrape_profile import CONTEXT_OPTIONS, TrafficStats, apply_profile, load_page
+from rate_control import call_with_retries, check_response
+from video_store import VideoStore
+from video_feeds import write_warroom_feed
+import metrics
+import profiling
 
 # Automated via GitHub Actions - runs twice daily at 8:00 AM and 8:00 PM UTC
 
 # URL of the Rumble War Room channel
 URL = "https://rumble.com/c/BannonsWarRoom/videos"
-OUTPUT_FILE = "warroom_videos.json"  # Make sure this is defined
+OUTPUT_FILE = "warroom_videos.json"  # Legacy single file, imported into the video store on first run
+MAX_CATCHUP_PAGES = 50  # Upper bound on pages walked in one run
 
 def parse_rumble_date(date_text):
     """Convert Rumble's relative date to datetime object"""
@@ -51,56 +57,12 @@ def parse_rumble_date(date_text):
     return now
 
 def load_existing_data():
-    """Load the most recent video URL from the JSON file if it exists, otherwise return None"""
-    if not os.path.exists(OUTPUT_FILE):
-        print(f"Creating new {OUTPUT_FILE} file")
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump({"last_updated": datetime.utcnow().isoformat(), "videos": []}, f, indent=4)
-        return None
+    """Load the video store once; its `links` set answers "have we seen this video?" in O(1)"""
+    return VideoStore().load(legacy_file=OUTPUT_FILE)
 
-    try:
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # Check if data is a dict with videos key (new format)
-            if isinstance(data, dict) and 'videos' in data:
-                videos = data['videos']
-            else:
-                # Old format - direct list of videos
-                videos = data
-                # Convert to new format
-                data = {
-                    "last_updated": datetime.utcnow().isoformat(),
-                    "videos": videos
-                }
-                with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=4)
-            
-            # Return the URL of the most recent video (first entry in the list)
-            if videos:
-                return videos[0]['link']
-            else:
-                return None
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error loading {OUTPUT_FILE}: {str(e)}")
-        return None
-
-def append_data(videos):
-    """Append the new batch of videos to the existing JSON file at the beginning"""
-    try:
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, dict) and 'videos' in data:
-                existing_videos = data['videos']
-            else:
-                existing_videos = data
-    except (FileNotFoundError, json.JSONDecodeError):
-        existing_videos = []
-    
-    # Create a set of existing URLs to avoid duplicates
-    existing_urls = {video['link'] for video in existing_videos}
-    
-    # Filter out any duplicates from new videos while preserving order
-    unique_new_videos = [video for video in videos if video['link'] not in existing_urls]
+def append_data(store, videos):
+    """Add the new batch of videos (newest first) to the store and write the current shard"""
+    unique_new_videos = store.add(videos)
     
     # Print debug information about new videos
     print("\nDebug: New videos (in order of discovery):")
@@ -108,121 +70,118 @@ def append_data(videos):
         print(f"Title: {video['title']}")
         print("---")
     
-    # Create a new list with new videos at the beginning (maintaining their original order)
-    combined_videos = unique_new_videos + existing_videos
+    with metrics.stage('store_save'):
+        saved = store.save()
+    if saved:
+        with metrics.stage('feed_write'):
+            write_warroom_feed(store)
     
-    # Create the new data structure with timestamp
-    output_data = {
-        'last_updated': datetime.utcnow().isoformat(),
-        'videos': combined_videos
-    }
-    
-    # Save the combined data back to the JSON file
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, indent=4)
-    
-    print(f"\nAdded {len(unique_new_videos)} new videos at the beginning of {OUTPUT_FILE}")
+    print(f"\nAdded {len(unique_new_videos)} new videos to shard {store.current_shard}")
     if unique_new_videos:
         print("New videos added (in original order):")
         for video in unique_new_videos:
             print(f"- {video['title']}")
 
 def scrape_rumble():
-    # Load the most recent video URL
-    last_video_url = load_existing_data()
-    print(f"Last known video URL: {last_video_url}")
+    # Load every video link we already have
+    store = load_existing_data()
+    known_links = store.links
 
     with sync_playwright() as p:
         # Launch browser with specific options
         browser = p.chromium.launch(headless=True)
         context = browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
+            **CONTEXT_OPTIONS,
             user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         )
+        traffic = TrafficStats()
+        apply_profile(context, traffic)
         page = context.new_page()
 
         try:
-            # Go to URL with timeout and wait until network is idle
-            print(f"Navigating to {URL}...")
-            page.goto(URL, timeout=30000, wait_until='networkidle')
-            
-            # Wait for the page to load, specifically for the video container
-            print("Waiting for video grid to load...")
-            page.wait_for_selector("ol.thumbnail__grid", timeout=30000)
-            
-            # Scroll down a bit to ensure all videos are loaded
-            page.evaluate("window.scrollTo(0, 500)")
-            page.wait_for_timeout(2000)  # Wait for any dynamic content to load
-            
-            # List to store new videos
+            # List to store new videos (newest first, in order of discovery)
             new_videos = []
-            total_scraped = 0
-
-            # Select video elements on the current page
-            video_elements = page.query_selector_all("ol.thumbnail__grid div.thumbnail__thumb")
-            print(f"Found {len(video_elements)} video elements on this page.")
-
-            if len(video_elements) == 0:
-                print("No video elements found on this page!")
-                return
-
-            # Extract video details from each video element
-            most_recent_video = None
-            for video in video_elements:
-                try:
-                    img_element = video.query_selector("img.thumbnail__image")
-                    if img_element:
-                        title = img_element.get_attribute("alt")
-                        thumbnail = img_element.get_attribute("src")
-
-                    link_element = video.query_selector("a.videostream__link.link")
-                    if link_element:
-                        link = link_element.get_attribute("href")
-                        
-                        if title and link:
-                            video_url = "https://rumble.com" + link
-                            
-                            # Keep track of the most recent video we checked
-                            if most_recent_video is None:
-                                most_recent_video = {"title": title, "url": video_url}
-                            
-                            # Stop if we've reached the most recent video (already in the JSON)
-                            if video_url == last_video_url:
-                                print(f"Reached the most recent video: {title}")
-                                print(f"URL: {video_url}")
-                                break
-                            
-                            # Add new videos to the list (in order of discovery)
-                            new_videos.append({
-                                "title": title.strip(),
-                                "link": video_url,
-                                "thumbnail": thumbnail,
-                                "uploader": "https://warroom.org"
-                            })
-                except Exception as e:
-                    print(f"Error extracting video data: {str(e)}")
-                    continue
-
-            total_scraped += len(new_videos)
-
-            # Save new data to JSON (prepend the new videos to existing data)
+            new_links = set()
+            total_processed = 0
+
+            # Walk pages until one holds nothing but known videos, so a gap of
+            # more than one page of uploads between runs is still caught up
+            for page_num in range(1, MAX_CATCHUP_PAGES + 1):
+                page_url = f"{URL}?page={page_num}" if page_num > 1 else URL
+
+                # Go to URL, backing off and retrying on timeouts, 429s and 5xx
+                print(f"Navigating to {page_url}...")
+                call_with_retries(lambda: check_response(page_url, load_page(page, page_url, timeout=30000)))
+                
+                # Wait for the page to load, specifically for the video container.
+                # The grid is server-rendered, so no scrolling or settle time is needed
+                print("Waiting for video grid to load...")
+                page.wait_for_selector("ol.thumbnail__grid", timeout=30000)
+                traffic.end_page(page_url)
+
+                # Pull every video on the page in a single evaluate() call
+                with metrics.stage('extract'):
+                    rows = extract_items(page, RUMBLE_VIDEOS)
+                metrics.inc('listing_pages_total')
+                print(f"Found {len(rows)} video elements on page {page_num}.")
+
+                if page_num > 1:
+                    # Past the last page Rumble shows the last page again
+                    _, current = rumble_pages(extract_items(page, RUMBLE_PAGINATOR))
+                    if current != page_num:
+                        print("Reached the last page of the channel")
+                        break
+
+                if len(rows) == 0:
+                    print("No video elements found on this page!")
+                    break
+
+                total_processed += len(rows)
+                page_new = 0
+                for row in rows:
+                    video = rumble_video(row)
+                    if not video or video['link'] in known_links or video['link'] in new_links:
+                        continue
+                    new_links.add(video['link'])
+                    new_videos.append(video)
+                    page_new += 1
+
+                print(f"{page_new} new videos on page {page_num}")
+                if page_new == 0:
+                    print("Page contains only known videos, caught up")
+                    break
+            else:
+                print(f"Stopped after {MAX_CATCHUP_PAGES} pages without reaching known videos")
+
+            # Save new data (prepend the new videos to the current month's shard)
+            metrics.inc('videos_total', total_processed, result='seen')
+            metrics.inc('videos_total', len(new_videos), result='new')
             if new_videos:
-                append_data(new_videos)
-                print(f"Added {total_scraped} new videos")
+                append_data(store, new_videos)
+                print(f"Added {len(new_videos)} new videos")
             else:
-                if most_recent_video:
-                    print(f"No new videos found. Most recent video: {most_recent_video['title']}")
-                    print(f"URL: {most_recent_video['url']}")
-                else:
-                    print("No videos found at all!")
+                print("No new videos found.")
 
-            print(f"Scraping completed. Total videos processed: {len(video_elements)}")
+            print(f"Scraping completed. Total videos processed: {total_processed}")
+            print(f"Traffic: {traffic.get_stats()}")
             
         except Exception as e:
+            # Nothing is saved: a partial catch-up would look complete to the next run
             print(f"Error during scraping: {str(e)}")
         finally:
             browser.close()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Add new War Room Rumble videos to the video store')
+    profiling.add_argument(parser)
+    return parser.parse_args()
+
 # Run scraper
 if __name__ == "__main__":
-    scrape_rumble()
+    args = parse_args()
+    if args.profile:
+        profiling.start()
+    try:
+        scrape_rumble()
+    finally:
+        metrics.write_run_summary('warroom_video_updater')
@@ -0,0 +1,42 @@
+"""Shared fixtures: the scripts and the benchmark fixture server, importable from the tests.
+
+The server builds its pages from the repository's own warroom-articles.json
+and natalie-videos.json, so nothing here touches the network.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT_DIR, 'scripts'), os.path.join(ROOT_DIR, 'benchmarks')]
+
+from fixture_server import CORPUS_FILE, VIDEOS_FILE, Fixtures, FixtureServer  # noqa: E402
+
+LISTING_PAGES = 3  # Enough articles for a few API batches, quick to build
+
+
+@pytest.fixture
+def fixtures():
+    return Fixtures(os.path.join(ROOT_DIR, CORPUS_FILE), os.path.join(ROOT_DIR, VIDEOS_FILE),
+                    listing_pages=LISTING_PAGES)
+
+
+@pytest.fixture
+def serve(fixtures):
+    """Start a FixtureServer over `fixtures`; keyword arguments go to FixtureServer"""
+    servers = []
+
+    def start(**kwargs):
+        server = FixtureServer(fixtures, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def server(serve):
+    return serve()
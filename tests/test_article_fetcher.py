@@ -0,0 +1,89 @@
+import asyncio
+
+from article_fetcher import CONTENT_SELECTORS, FallbackFetcher, HttpFetcher
+
+JS_ONLY_PAGE = ('<!DOCTYPE html><html><head><title>Loading</title></head>'
+                '<body><div id="app"></div><script src="/app.js"></script></body></html>')
+RENDERED = '<p>Rendered by the browser</p>'
+
+
+class RecordingBrowser:
+    """Stands in for BrowserFetcher, which needs Chromium; records what it was asked for"""
+
+    name = 'browser'
+
+    def __init__(self):
+        self.urls = []
+
+    async def fetch_content(self, url):
+        self.urls.append(url)
+        return RENDERED, 'article'
+
+    async def close(self):
+        pass
+
+
+def fetch(fetcher, url):
+    async def run():
+        try:
+            return await fetcher.fetch_content(url)
+        finally:
+            await fetcher.close()
+    return asyncio.run(run())
+
+
+def article_url(server, fixtures):
+    path, article = next(iter(fixtures.articles.items()))
+    return server.base_url + path, article
+
+
+def test_http_fetcher_extracts_server_rendered_content(fixtures, server):
+    url, article = article_url(server, fixtures)
+    content, selector = fetch(HttpFetcher(), url)
+    assert selector in CONTENT_SELECTORS
+    first_paragraph = article['content'].split('</p>')[0]
+    assert first_paragraph in content
+
+
+def test_fallback_uses_http_when_it_finds_content(fixtures, server):
+    url, _ = article_url(server, fixtures)
+    browser = RecordingBrowser()
+    fetcher = FallbackFetcher(HttpFetcher(), browser)
+    content, _ = fetch(fetcher, url)
+    assert content and content != RENDERED
+    assert browser.urls == []
+    assert fetcher.hits == {'http': 1, 'browser': 0}
+
+
+def assert_falls_back(fetcher, browser, url):
+    assert fetch(fetcher, url) == (RENDERED, 'article')
+    assert browser.urls == [url]
+    assert fetcher.hits == {'http': 0, 'browser': 1}
+
+
+def test_fallback_on_js_only_page(fixtures, server):
+    path, _ = next(iter(fixtures.articles.items()))
+    fixtures.article_pages[path] = JS_ONLY_PAGE
+    browser = RecordingBrowser()
+    assert_falls_back(FallbackFetcher(HttpFetcher(), browser), browser, server.base_url + path)
+
+
+def test_fallback_on_empty_body(fixtures, server):
+    path, _ = next(iter(fixtures.articles.items()))
+    fixtures.article_pages[path] = ''
+    browser = RecordingBrowser()
+    assert_falls_back(FallbackFetcher(HttpFetcher(), browser), browser, server.base_url + path)
+
+
+def test_fallback_on_403(fixtures, serve):
+    server = serve(error_rate=1.0, error_status=403)
+    url, _ = article_url(server, fixtures)
+    browser = RecordingBrowser()
+    assert_falls_back(FallbackFetcher(HttpFetcher(), browser), browser, url)
+
+
+def test_fallback_on_timeout(fixtures, serve):
+    server = serve(latency_ms=1000)
+    url, _ = article_url(server, fixtures)
+    browser = RecordingBrowser()
+    assert_falls_back(FallbackFetcher(HttpFetcher(timeout=0.1), browser), browser, url)
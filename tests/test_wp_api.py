@@ -0,0 +1,137 @@
+import asyncio
+import functools
+
+from fixture_server import API_PATH
+from rate_control import RateController
+import scrape_warroom
+from wp_api import DEFAULT_AUTHOR, WordPressAPI, post_to_preview
+
+
+def collect(api, modified_after=None, edit=None):
+    """Every post iter_pages yields, in order; `edit(ids)` runs after each batch"""
+    async def run():
+        ids = []
+        try:
+            async for posts, _ in api.iter_pages(modified_after):
+                ids.extend(post['id'] for post in posts)
+                if edit:
+                    edit(ids)
+        finally:
+            await api.close()
+        return ids
+    return asyncio.run(run())
+
+
+def api_post(fixtures, **changes):
+    post = dict(fixtures.posts[0], link='https://warroom.org' + fixtures.posts[0]['path'])
+    post.update(changes)
+    return post
+
+
+def test_post_to_preview(fixtures):
+    article = next(iter(fixtures.articles.values()))
+    preview = post_to_preview(api_post(fixtures))
+    assert preview['url'] == 'https://warroom.org' + fixtures.posts[0]['path']
+    assert preview['title'] == article['title']
+    assert preview['author'] == (article.get('author') or DEFAULT_AUTHOR)
+    assert preview['date'] == fixtures.posts[0]['date'][:10]
+    assert preview['content'] == article['content']
+
+
+def test_post_to_preview_without_embedded_author_or_terms(fixtures):
+    preview = post_to_preview(api_post(fixtures, _embedded={}))
+    assert preview['author'] == DEFAULT_AUTHOR
+    assert preview['categories'] == ['News']
+
+    preview = post_to_preview(api_post(fixtures, _embedded={
+        'author': [{'id': 1}],
+        'wp:term': [[{'taxonomy': 'post_tag', 'name': 'Tag'}, {'taxonomy': 'category', 'name': 'Law &amp; Order'}]]
+    }))
+    assert preview['author'] == DEFAULT_AUTHOR
+    assert preview['categories'] == ['Law & Order']
+
+
+def test_post_to_preview_password_protected(fixtures):
+    preview = post_to_preview(api_post(fixtures, content={'rendered': '', 'protected': True}))
+    assert preview['content'] == ''
+    assert post_to_preview(api_post(fixtures, content=None))['content'] == ''
+
+
+def test_iter_pages_reads_every_post_once(fixtures, server):
+    ids = collect(WordPressAPI(server.base_url + API_PATH, per_page=4))
+    assert sorted(ids) == sorted(post['id'] for post in fixtures.posts)
+    modified = {post['id']: post['modified'] for post in fixtures.posts}
+    assert [modified[i] for i in ids] == sorted(modified[i] for i in ids)
+
+
+def test_iter_pages_shared_timestamp_ends_on_invalid_page(fixtures, server):
+    # Every post shares one timestamp, so the cursor can't move and page
+    # numbers take over until the server answers 400 past the end
+    assert len(fixtures.posts) % 3 == 0
+    for post in fixtures.posts:
+        post['modified'] = '2020-01-01T00:00:00'
+    ids = collect(WordPressAPI(server.base_url + API_PATH, per_page=3), modified_after='2019-12-31T23:59:59')
+    assert sorted(ids) == sorted(post['id'] for post in fixtures.posts)
+
+
+def test_iter_pages_past_the_end(server):
+    async def run():
+        api = WordPressAPI(server.base_url + API_PATH, per_page=5)
+        try:
+            return await api.fetch_page(page_num=99)
+        finally:
+            await api.close()
+    assert asyncio.run(run()) == ([], 0)
+
+
+def test_iter_pages_survives_edits_during_the_crawl(fixtures, server):
+    # An edit moves an already read post to the end; page numbers would skip a post
+    def edit(ids):
+        if len(ids) == 4:
+            fixtures.posts[ids[0] - 1]['modified'] = '2099-01-01T00:00:00'
+    ids = collect(WordPressAPI(server.base_url + API_PATH, per_page=4), edit=edit)
+    assert sorted(ids) == sorted(post['id'] for post in fixtures.posts)
+
+
+def test_iter_pages_cancels_prefetch(server):
+    async def run():
+        api = WordPressAPI(server.base_url + API_PATH, per_page=2)
+        pages = api.iter_pages()
+        async for _ in pages:
+            break
+        await pages.aclose()
+        await api.close()
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    assert asyncio.run(run()) == []
+
+
+def unthrottled(monkeypatch, server, api_path=API_PATH):
+    monkeypatch.setattr(scrape_warroom, 'POSTS_API_URL', server.base_url + api_path)
+    monkeypatch.setattr(scrape_warroom, 'RateController',
+                        functools.partial(RateController, host_rate=1e6, host_burst=1e6))
+
+
+def test_api_producer_scrapes_without_the_browser(fixtures, server, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    unthrottled(monkeypatch, server)
+    articles, _ = asyncio.run(scrape_warroom.scrape_articles(source='api'))
+    assert len(articles) == len(fixtures.posts)
+    assert all(article['content'] for article in articles)
+
+
+def test_api_producer_falls_back_to_listing_crawl(server, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    unthrottled(monkeypatch, server, api_path='/wp-json/disabled/')
+    calls = []
+
+    async def ensure_browser(pool):
+        calls.append('ensure_browser')
+
+    async def listing_producer(pool, url_queue, state, store, controller):
+        calls.append('listing_producer')
+
+    monkeypatch.setattr(scrape_warroom.BrowserPool, 'ensure_browser', ensure_browser)
+    monkeypatch.setattr(scrape_warroom, 'listing_producer', listing_producer)
+    articles, _ = asyncio.run(scrape_warroom.scrape_articles(source='api'))
+    assert calls == ['ensure_browser', 'listing_producer']
+    assert articles == []